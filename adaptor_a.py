@@ -10,17 +10,67 @@ MAX_EOF_COUNT = 2         # Max EOFs allowed in that interval
 INIT_TIMEOUT = 16         # Timeout when initialising SensorTag (sec)
 GATT_SLEEP_TIME = 2       # Time to sleep between killing one gatt process & starting another
 MAX_NOTIFY_INTERVAL = 10  # Above this value tag will be polled rather than asked to notify (sec)
+POLL_TOLERANCE = 0.1      # Default fraction of a poll interval that a read may be early or late by
+SHM_RING_RECORDS = 4096   # Samples held by each shared memory ring
+METRICS_INTERVAL = 300    # Interval between metrics reports to the manager (sec)
+DELIVERY_QUEUE_LENGTH = 500  # Max stream samples queued for one app before the oldest are dropped
+SPOOL_DIR = "/tmp/cb_sensortag_spool"  # Where samples are stored when they cannot be delivered. Env CB_SENSORTAG_SPOOL_DIR
+SPOOL_MAX_BYTES = 16000000  # Oldest spooled samples are removed above this
+SPOOL_SEGMENT = 1000      # Samples in each spool segment. Also the size of a batch when the spool is flushed
+SPOOL_RETRY = 10          # Time after delivery fails before trying to flush the spool (sec)
+GATTTOOL = "gatttool"      # Env CB_SENSORTAG_GATTTOOL overrides. Eg: "python fakegatttool.py"
+SUPERVISE = False         # Share HCI adapters with other adaptors & restart gatttool locally. Env CB_SENSORTAG_SUPERVISE
+MAX_RESTARTS = 3          # In supervisor mode, gatttool restarts allowed within RESTART_WINDOW before giving up
+RESTART_WINDOW = 3600     # (sec)
+RESTART_ATTEMPTS = 3      # Attempts to reconnect in each restart before giving up
+PRIORITY = True           # Read ahead in gatttool's output for button presses & decode them first. Env CB_SENSORTAG_PRIORITY
+LOOKAHEAD = 65536         # Most bytes of gatttool's output read ahead of decoding
+PEXPECT_BEFORE = (4, 7)   # pexpect from this version also keeps what it has not matched in its private _before
+TRACE_EVERY = 0           # Trace 1 in this many samples from gatttool to apps. 0 = off. Env CB_SENSORTAG_TRACE_EVERY
 
-import pexpect
 import sys
 import time
 import os
 import json
+import signal
+import re
+import importlib
 from cbcommslib import CbAdaptor
 from cbconfig import *
 #from threading import Thread
 from twisted.internet import threads
 from twisted.internet import reactor
+from metrics import Metrics
+from delivery import DeliveryQueue, Deadband, POLICIES
+from collections import deque
+from planner import DutyPlanner
+
+class LazyModule():
+    """ A module that is imported when something in it is first used. For
+        those that only some configurations need, so that they don't slow
+        down starting.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attr):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attr)
+
+pexpect = LazyModule("pexpect")         # Not needed in simulation
+supervisor = LazyModule("supervisor")   # Supervisor mode
+spool = LazyModule("spool")             # Needed when delivery fails, and for the fields of rings
+shmring = LazyModule("shmring")         # Apps using shared memory
+frame = LazyModule("frame")             # Apps asking for frames
+
+def pexpectVersion():
+    # (major, minor) of the pexpect in use
+    try:
+        return tuple([int(v) for v in pexpect.__version__.split(".")[:2]])
+    except (AttributeError, ValueError):
+        return (0, 0)
 
 class Adaptor(CbAdaptor):
     def __init__(self, argv):
@@ -47,6 +97,19 @@ class Adaptor(CbAdaptor):
                            "luminance": [],
                            "connected": [],
                            "buttons": []}
+        # Characteristics asked for as part of a frame, rather than by themselves
+        self.frameApps = {}
+        self.history = {}           # Recent samples, for building frames
+        self.historySpan = {}       # Seconds of history each characteristic needs for the frames that use it
+        # Characteristics written to shared memory rings, for apps on the bridge
+        self.shmApps = {}
+        self.rings = {}             # characteristic: ShmRing
+        for c in self.notifyApps:
+            self.frameApps[c] = []
+            self.shmApps[c] = []
+            self.history[c] = deque()
+            self.historySpan[c] = 0
+        self.frames = {}            # app: Frame
         self.pollInterval = {"temperature": 10000,
                              "ir_temperature": 10000,
                              "acceleration": 10000,
@@ -56,18 +119,43 @@ class Adaptor(CbAdaptor):
                              "luminance": 10000,
                              "connected": 10000,
                              "buttons": 10000}
-        self.pollTime =     {"temperature": 0,
-                             "ir_temperature": 0,
-                             "acceleration": 0,
-                             "gyro": 0,
-                             "magnetometer": 0,
-                             "humidity": 0,
-                             "luminance": 0,
-                             "connected": 0,
-                             "buttons": 0}
+        self.pollTolerance = {}     # characteristic: how early or late a poll may be (sec)
+        self.planner = DutyPlanner()
+        self.periodWritten = []     # Polled sensors whose period has been set to its minimum
+        # What to do when an app falls behind. Apps may override per characteristic
+        self.defaultPolicy = {"temperature": "latest",
+                              "ir_temperature": "latest",
+                              "acceleration": "drop_oldest",
+                              "gyro": "drop_oldest",
+                              "magnetometer": "drop_oldest",
+                              "humidity": "latest",
+                              "luminance": "latest",
+                              "connected": "never_drop",
+                              "buttons": "never_drop",
+                              "frame": "latest"}
+        self.policy = {}            # app: {characteristic: policy}
+        self.deliveryQueues = {}    # app: DeliveryQueue
+        self.deadbands = {}         # app: {characteristic: Deadband}
+        self.spool = None           # Samples that could not be delivered
+        self.spooled = {}           # app: characteristics it has asked to have spooled
+        self.spooling = {}          # app: True while its samples are going to the spool
+        self.flushing = {}          # app: the reactor call that will next flush its spool
         self.activePolls = []
+        self.polling = False        # True once pollTag is running
+        self.firstSample = None     # Time from start to first sample delivered to an app (sec)
         self.lastEOFTime = time.time()
+        self.eofCount = 0
         self.processedApps = []
+        self.metrics = Metrics()
+        self.traceEvery = int(os.getenv("CB_SENSORTAG_TRACE_EVERY", TRACE_EVERY))
+        self.traceCount = 0
+        self.gatttool = os.getenv("CB_SENSORTAG_GATTTOOL", GATTTOOL)
+        self.priority = os.getenv("CB_SENSORTAG_PRIORITY", str(PRIORITY)).lower() in ("1", "true", "yes")
+        self.copyBefore = False     # True if takePriorityLines must change pexpect's _before too
+        self.supervise = os.getenv("CB_SENSORTAG_SUPERVISE", str(SUPERVISE)).lower() in ("1", "true", "yes")
+        self.pool = None            # AdapterPool, in supervisor mode
+        self.restarts = 0
+        self.lastRestart = 0
         
         # characteristics for communicating with the SensorTag
         # Write 0 to turn off gyroscope, 1 to enable X axis only, 2 to
@@ -135,6 +223,14 @@ class Adaptor(CbAdaptor):
                                     "data": str(format(self.primary["buttons"] + 2, "#06x"))
                                    }
 
+        reactor.callLater(METRICS_INTERVAL, self.reportMetrics)
+        # kill -USR1 dumps metrics on demand
+        signal.signal(signal.SIGUSR1, self.onMetricsSignal)
+
+        # Event characteristics are decoded & delivered ahead of others, never dropped, and always traced
+        self.events = ["buttons", "connected"]
+        self.priorityPattern = re.compile("handle = " + self.handles["buttons"]["data"] + "[^\r\n]*\r?\n")
+
         #CbAdaprot.__init__ MUST be called
         CbAdaptor.__init__(self, argv)
 
@@ -153,25 +249,13 @@ class Adaptor(CbAdaptor):
         if self.state == "activate":
             notifying = False
             for a in self.notifyApps:
-                if self.notifyApps[a]:
+                if self.wanted(a):
                     notifying = True
                     break
             if not notifying:
                 self.cbLog("info", "No sensors requested in notify mode")
-            elif self.sim == 0:
-                self.cbLog("debug", "Activating")
-                status = self.switchSensors()
-                self.cbLog("info", "switchSensors status: " + status)
-            reactor.callInThread(self.getValues)
-            polling = False
-            for a in self.pollApps:
-                if self.pollApps[a]:
-                    polling = True
-                    break
-            if not polling:
-                self.cbLog("info", "No sensors requested in polling  mode")
-            else:
-                reactor.callLater(0, self.pollTag)
+            reactor.callInThread(self.startValues, notifying)
+            self.startPolling()
             self.state = "running"
         # error is only ever set from the running state, so set back to running if error is cleared
         if action == "error":
@@ -188,7 +272,63 @@ class Adaptor(CbAdaptor):
                "state": external_state}
         self.sendManagerMessage(msg)
 
+    def callFromThread(self, f, *args):
+        # All hand-offs from getValues to the reactor go through here so that queue depth can be tracked
+        self.metrics.adjust("reactor_queue", 1)
+        reactor.callFromThread(self.runFromThread, f, *args)
+
+    def runFromThread(self, f, *args):
+        self.metrics.adjust("reactor_queue", -1)
+        f(*args)
+
+    def reportMetrics(self, reschedule=True):
+        self.metrics.setGauge("bad_count", self.badCount)
+        self.metrics.setGauge("eof_count", self.eofCount)
+        queued = {}
+        for a in self.deliveryQueues:
+            queued[a] = len(self.deliveryQueues[a])
+        self.metrics.setGauge("queued", queued)
+        if self.spool:
+            self.metrics.setGauge("spool_bytes", self.spool.bytes)
+            self.metrics.setGauge("spool_evicted", self.spool.evicted)
+        msg = {"id": self.id,
+               "status": "metrics",
+               "metrics": self.metrics.snapshot()}
+        self.cbLog("debug", "metrics: " + str(json.dumps(msg["metrics"])))
+        self.sendManagerMessage(msg)
+        if reschedule:
+            reactor.callLater(METRICS_INTERVAL, self.reportMetrics)
+
+    def onMetricsSignal(self, signum, frame):
+        reactor.callFromThread(self.reportMetrics, False)
+
+    def startValues(self, notifying):
+        # Switching sensors on blocks, so it is done in the getValues thread rather than the reactor
+        if notifying and self.sim == 0:
+            self.cbLog("debug", "Activating")
+            status = self.switchSensors()
+            self.cbLog("info", "switchSensors status: " + status)
+        self.getValues()
+
+    def startPolling(self):
+        polling = False
+        for a in self.pollApps:
+            if self.pollApps[a]:
+                polling = True
+                break
+        if not polling:
+            self.cbLog("info", "No sensors requested in polling  mode")
+        elif not self.polling:
+            self.polling = True
+            reactor.callLater(0, self.pollTag)
+
     def onStop(self):
+        if self.pool:
+            self.pool.release(self.addr)
+        if self.spool:
+            self.spool.close()
+        for c in self.rings:
+            self.rings[c].close()
         # Mainly caters for situation where adaptor is told to stop while it is starting
         if self.connected:
             try:
@@ -200,16 +340,23 @@ class Adaptor(CbAdaptor):
     def initSensorTag(self):
         self.cbLog("info", "Init")
         try:
-            cmd = 'gatttool -i ' + self.device + ' -b ' + self.addr + \
+            cmd = self.gatttool + ' -i ' + self.device + ' -b ' + self.addr + \
                   ' --interactive'
             self.cbLog("debug", "cmd: " + str(cmd))
-            self.gatt = pexpect.spawn(cmd)
+            if pexpectVersion() >= (4, 0):
+                # Lines as str, as pexpect 3 gives on Python 2, rather than bytes
+                self.gatt = pexpect.spawn(cmd, encoding="utf-8")
+            else:
+                self.gatt = pexpect.spawn(cmd)
         except:
             self.cbLog("error", "Dead!")
             self.connected = False
             self.cbLog("debug", "initSensorTag 1, connected: " + str(self.connected))
             self.sendcharacteristic("connected", self.connected, time.time())
             return "noConnect"
+        if self.priority and not self.priorityPossible():
+            self.cbLog("warning", "Priority path off. Not known to work with pexpect " + str(pexpect.__version__))
+            self.priority = False
         self.gatt.expect('\[LE\]>')
         self.gatt.sendline('connect')
         index = self.gatt.expect(['successful', pexpect.TIMEOUT, pexpect.EOF], timeout=INIT_TIMEOUT)
@@ -217,6 +364,7 @@ class Adaptor(CbAdaptor):
             # index 2 is not actually a timeout, but something has gone wrong
             self.connected = False
             self.cbLog("debug", "initSensorTag 2, connected: " + str(self.connected))
+            self.reportLink(False)
             self.sendcharacteristic("connected", self.connected, time.time())
             self.gatt.kill(9)
             # Wait a second just to give SensorTag time to "recover"
@@ -225,52 +373,106 @@ class Adaptor(CbAdaptor):
         else:
             self.connected = True
             self.cbLog("debug", "initSensorTag 3, connected: " + str(self.connected))
+            self.reportLink(True)
+            self.periodWritten = []
             self.sendcharacteristic("connected", self.connected, time.time())
             return "ok"
 
+    def reportLink(self, ok):
+        # In supervisor mode, move to another adapter if this one keeps failing.
+        # Only after a failure, as after a success gatttool is still using this one
+        if self.pool and self.pool.report(self.device, ok) and not ok:
+            device = self.pool.assign(self.addr, [self.device])
+            if device != self.device:
+                self.cbLog("warning", "Adapter " + self.device + " degraded. Moving to " + device)
+                self.metrics.incr("adapter_moves")
+                self.device = device
+
+    def restartGatt(self):
+        """ In supervisor mode a gatttool process that has died is restarted
+            here rather than by the manager restarting the adaptor. Apps and
+            their requests are kept, so the sensors just need switching on again.
+            Returns False if the tag could not be reconnected to.
+        """
+        if time.time() - self.lastRestart > RESTART_WINDOW:
+            self.restarts = 0
+        if self.restarts >= MAX_RESTARTS:
+            return False
+        self.restarts += 1
+        self.lastRestart = time.time()
+        self.metrics.incr("restarts")
+        self.cbLog("warning", "gatttool died. Restart " + str(self.restarts) + " of " + str(MAX_RESTARTS))
+        self.connected = False
+        self.reportLink(False)
+        status = ""
+        attempts = 0
+        while status != "ok" and not self.doStop and attempts < RESTART_ATTEMPTS:
+            attempts += 1
+            try:
+                self.gatt.kill(9)
+            except:
+                pass
+            time.sleep(GATT_SLEEP_TIME)
+            status = self.initSensorTag()
+            if status == "ok":
+                status = self.switchSensors()
+        self.eofCount = 0
+        return status == "ok"
+
     def checkAllProcessed(self, appID):
+        """ Called after each app request. The tag is configured as soon as
+            the first app has asked for something, rather than after every
+            app has, so that the first sample is not held up by the others.
+            Later requests add to the configuration.
+        """
         self.processedApps.append(appID)
         found = True
         for a in self.appInstances:
             if a not in self.processedApps:
                 found = False
         if found:
-            thereAreNotifyApps = False
-            for a in self.notifyApps:
-                # Allow buttons to be the only notifying characteristic
-                if self.notifyApps[a] and a != "buttons" and a != "connected":
-                    thereAreNotifyApps = True
-            # Check required polling times and set timeout accordingly
-            minPollInterval = 10000
-            for a in self.pollApps:
-                if self.pollApps[a]:
-                    if thereAreNotifyApps:
-                        for app in self.pollApps[a]:
-                            self.notifyApps[a].append(app)
-                        self.pollApps[a] = []
-                    elif self.pollInterval[a] < minPollInterval:
-                        minPollInterval = self.pollInterval[a]
-                        self.gattTimeout = minPollInterval + 5
-            self.cbLog("debug", "gattTimeout: " + str(self.gattTimeout))
-            for a in self.notifyApps:
-                if a != "ir_temperature" and a != "connected":
-                    if self.notifyApps[a]:
-                        if "period" in self.handles[a]:
-                            # Value to write is n * 10ms
-                            i = int(self.pollInterval[a] * 100)
-                            if i > 255:
-                                i = 255
-                            elif i < self.handles[a]["min_period"]:
-                                i = self.handles[a]["min_period"]
-                            elif i > int(self.handles[a]["period_value"], 16):
-                                i =int(self.handles[a]["period_value"], 16)
-                            self.handles[a]["period_value"] = ' ' + hex(i)[2:].zfill(2)
-                            self.cbLog("debug", "period value: " + str(a) + " " + str(self.handles[a]["period_value"]))
-            self.cbLog("info", "notifyApps: " + str(json.dumps(self.notifyApps, indent=4)))
-            self.cbLog("info", "pollApps: " + str(json.dumps(self.pollApps, indent=4)))
-            self.cbLog("info", "pollIntervals: " +  str(json.dumps(self.pollInterval, indent=4)))
-            self.cbLog("debug", "connected: " + str(self.connected))
-            self.sendcharacteristic("connected", self.connected, time.time())
+            self.cbLog("debug", "All apps processed")
+        thereAreNotifyApps = False
+        for a in self.notifyApps:
+            # Allow buttons to be the only notifying characteristic
+            if self.wanted(a) and a != "buttons" and a != "connected":
+                thereAreNotifyApps = True
+        # Check required polling times and set timeout accordingly
+        minPollInterval = 10000
+        for a in self.pollApps:
+            if self.pollApps[a]:
+                if thereAreNotifyApps:
+                    for app in self.pollApps[a]:
+                        self.notifyApps[a].append(app)
+                    self.pollApps[a] = []
+                elif self.pollInterval[a] < minPollInterval:
+                    minPollInterval = self.pollInterval[a]
+                    self.gattTimeout = minPollInterval + 5
+        self.cbLog("debug", "gattTimeout: " + str(self.gattTimeout))
+        for a in self.notifyApps:
+            if a != "ir_temperature" and a != "connected":
+                if self.wanted(a):
+                    if "period" in self.handles[a]:
+                        # Value to write is n * 10ms
+                        i = int(self.pollInterval[a] * 100)
+                        if i > 255:
+                            i = 255
+                        elif i < self.handles[a]["min_period"]:
+                            i = self.handles[a]["min_period"]
+                        elif i > int(self.handles[a]["period_value"], 16):
+                            i =int(self.handles[a]["period_value"], 16)
+                        self.handles[a]["period_value"] = ' ' + hex(i)[2:].zfill(2)
+                        self.cbLog("debug", "period value: " + str(a) + " " + str(self.handles[a]["period_value"]))
+        self.setHistorySpans()
+        self.cbLog("info", "notifyApps: " + str(json.dumps(self.notifyApps, indent=4)))
+        self.cbLog("info", "pollApps: " + str(json.dumps(self.pollApps, indent=4)))
+        self.cbLog("info", "pollIntervals: " +  str(json.dumps(self.pollInterval, indent=4)))
+        self.cbLog("debug", "connected: " + str(self.connected))
+        self.sendcharacteristic("connected", self.connected, time.time())
+        self.planPolls()
+        if self.state == "running":
+            self.updateSensors()
+        elif self.state != "inUse":
             self.setState("inUse")
 
     def writeTag(self, handle, cmd):
@@ -280,6 +482,7 @@ class Adaptor(CbAdaptor):
         index = self.gatt.expect(['successfully', pexpect.TIMEOUT, pexpect.EOF], timeout=1)
         if index == 1 or index == 2:
             self.cbLog("debug", "char-write-req failed. index =  " + str(index) + " for: " + line)
+            self.metrics.incr("write_failures")
             self.tagOK = "not ok"
 
     def writeTagNoCheck(self, handle, cmd):
@@ -293,43 +496,130 @@ class Adaptor(CbAdaptor):
         self.gatt.sendline(line)
         # The value read is caught by getValues
 
-    def switchSensors(self):
+    def usedIRTemperature(self):
+        return self.wanted("ir_temperature") or self.pollApps["ir_temperature"]
+
+    def wanted(self, characteristic):
+        # True if any app wants characteristic notified, by itself, in a frame or in a ring
+        return self.notifyApps[characteristic] or self.frameApps[characteristic] or self.shmApps[characteristic]
+
+    def switchSensors(self, writeTag=None):
         """ Call whenever an app updates its sensor configuration. Turns
             individual sensors in the Tag on or off.
         """
+        if writeTag is None:
+            writeTag = self.writeTag
         self.tagOK = "ok"
         for a in self.notifyApps:
             if a != "ir_temperature" and a != "connected":
-                if self.notifyApps[a]:
+                if self.wanted(a) or (a == "temperature" and self.wanted("ir_temperature")):
                     if "en_on" in self.handles[a]:
                         self.cbLog("debug", "writing " + a + " en_on")
-                        self.writeTag(self.handles[a]["en"], self.handles[a]["en_on"])
+                        writeTag(self.handles[a]["en"], self.handles[a]["en_on"])
                     elif "en" in self.handles[a]:
                         self.cbLog("debug", "writing " + a + " en")
-                        self.writeTag(self.handles[a]["en"], self.cmd["on"])
+                        writeTag(self.handles[a]["en"], self.cmd["on"])
                     if "notify" in self.handles[a]:
                         self.cbLog("debug", "writing " + a + " notify")
-                        self.writeTag(self.handles[a]["notify"], self.cmd["notify"])
+                        writeTag(self.handles[a]["notify"], self.cmd["notify"])
                     if "period" in self.handles[a]:
                         self.cbLog("debug", "writing " + a + " period, value: " + self.handles[a]["period_value"])
-                        self.writeTag(self.handles[a]["period"], self.handles[a]["period_value"])
-                else:
-                    pass
-                    #if "en" in self.handles[a]:
-                    #    self.writeTag(self.handles[a]["en"], self.cmd["off"])
+                        writeTag(self.handles[a]["period"], self.handles[a]["period_value"])
+                elif not self.pollApps[a] and not (a == "temperature" and self.usedIRTemperature()):
+                    # Nobody wants this sensor, so make sure it is off
+                    if "en_off" in self.handles[a]:
+                        writeTag(self.handles[a]["en"], self.handles[a]["en_off"])
+                    elif "en" in self.handles[a]:
+                        writeTag(self.handles[a]["en"], self.cmd["off"])
         return self.tagOK
 
-    def pollTag(self):
+    def updateSensors(self):
+        # Used when apps change what they want once getValues is running. getValues
+        # is reading the gatt output, so writes cannot wait for a response.
+        if self.sim == 0:
+            self.switchSensors(self.writeTagNoCheck)
+        self.startPolling()
+
+    def planPolls(self):
+        """ Gives the planner the sensors to be polled and reports the
+            battery drain it estimates for the whole configuration.
+        """
+        now = time.time()
+        polled = {}
         for a in self.pollApps:
-            if self.pollApps[a] and (a != "ir_temperature" or a != "connected"):
-                if time.time() > self.pollTime[a]:
-                    reactor.callLater(0, self.switchSensorOn, a)
-                    self.pollTime[a] = time.time() + self.pollInterval[a]
+            if self.pollApps[a] and a not in self.events:
+                # ir_temperature comes from the temperature sensor
+                if a == "ir_temperature":
+                    sensor = "temperature"
+                else:
+                    sensor = a
+                interval = self.pollInterval[a]
+                tolerance = self.pollTolerance.get(a, POLL_TOLERANCE * interval)
+                if sensor in polled:
+                    interval = min(interval, polled[sensor][0])
+                    tolerance = min(tolerance, polled[sensor][1])
+                polled[sensor] = (interval, tolerance)
+        for sensor in list(self.planner.sensors):
+            if sensor not in polled:
+                self.planner.remove(sensor)
+        for sensor in polled:
+            self.planner.set(sensor, polled[sensor][0], polled[sensor][1], now)
+        notify = {}
+        onTime = {}
+        for a in self.handles:
+            if "period" in self.handles[a]:
+                onTime[a] = self.handles[a]["min_period"]/100.0
+            if a in self.events or not self.wanted(a):
+                continue
+            if "period" in self.handles[a]:
+                notify[a] = int(self.handles[a]["period_value"], 16)/100.0
+            else:
+                notify[a] = 0.1
+        if self.wanted("ir_temperature") and "temperature" not in notify:
+            notify["temperature"] = int(self.handles["temperature"]["period_value"], 16)/100.0
+        estimate = self.planner.estimate(notify, onTime)
+        self.metrics.setGauge("battery", estimate)
+        self.cbLog("info", "Battery estimate: " + str(json.dumps(estimate)))
+        msg = {"id": self.id,
+               "status": "battery",
+               "battery": estimate}
+        reactor.callFromThread(self.sendManagerMessage, msg)
+
+    def samplePeriod(self, characteristic):
+        # Seconds between notifications of characteristic, or the most it can be if the tag doesn't say
+        if characteristic == "ir_temperature":
+            characteristic = "temperature"
+        if characteristic in self.handles and "period" in self.handles[characteristic]:
+            return int(self.handles[characteristic]["period_value"], 16)/100.0
+        return MAX_NOTIFY_INTERVAL
+
+    def setHistorySpans(self):
+        spans = {}
+        for c in self.history:
+            spans[c] = 0
+        for f in list(self.frames.values()):
+            periods = {}
+            for c in f.characteristics:
+                periods[c] = self.samplePeriod(c)
+            span = f.span(periods)
+            for c in f.characteristics:
+                spans[c] = max(spans[c], span)
+        self.historySpan = spans
+        self.cbLog("debug", "historySpan: " + str(json.dumps(spans)))
+
+    def pollTag(self):
+        # Sensors due at about the same time are switched on together
+        for sensor in self.planner.due(time.time()):
+            self.switchSensorOn(sensor)
         reactor.callLater(1, self.pollTag)
 
     def switchSensorOn(self, sensor):
         self.cbLog("debug", "switchSensorOn. sensor: " + sensor)
         if sensor != "ir_temperature" and sensor != "connected":
+            if "period" in self.handles[sensor] and sensor not in self.periodWritten:
+                # Shortest period, so that the sensor is on for as little time as possible
+                self.writeTagNoCheck(self.handles[sensor]["period"], ' ' + hex(self.handles[sensor]["min_period"])[2:].zfill(2))
+                self.periodWritten.append(sensor)
             if "en_on" in self.handles[sensor]:
                 self.writeTagNoCheck(self.handles[sensor]["en"], self.handles[sensor]["en_on"])
             elif "en" in self.handles[sensor]:
@@ -339,10 +629,14 @@ class Adaptor(CbAdaptor):
                 self.activePolls.append(sensor)
 
     def sensorRead(self, sensor):
-        if sensor in self.activePolls:
-            self.activePolls.remove(sensor)
         # ir_temperature comes from the temperature sensor
-        if sensor in self.pollApps and sensor != "ir_temperature" and sensor != "connected" and sensor != "buttons":
+        if sensor == "ir_temperature":
+            sensor = "temperature"
+        # Only switch off sensors that were switched on for a poll, and only once
+        if sensor not in self.activePolls:
+            return
+        self.activePolls.remove(sensor)
+        if sensor not in self.events:
             self.writeTagNoCheck(self.handles[sensor]["notify"], self.cmd["stop_notify"])
             if "en_off" in self.handles[sensor]:
                 self.writeTagNoCheck(self.handles[sensor]["en"], self.handles[sensor]["en_off"])
@@ -368,7 +662,7 @@ class Adaptor(CbAdaptor):
                 self.cbLog("error", "Failed to initialise")
         if not self.doStop:
             self.cbLog("info", "Initialised")
-            self.setState("connected")
+            reactor.callFromThread(self.setState, "connected")
         else:
             return
  
@@ -421,6 +715,46 @@ class Adaptor(CbAdaptor):
         v = (s * 1.0) / (65536/2000)
         return v
 
+    def priorityPossible(self):
+        """ Taking lines out of what pexpect has read relies on how pexpect keeps
+            it. Before PEXPECT_BEFORE it is only in buffer. In pexpect 4 from then
+            on there is a copy in _before, that is put back in buffer if buffer
+            gets shorter, so it has to be changed as well. Other versions of
+            pexpect have not been tried, so lines are not taken with them.
+        """
+        version = pexpectVersion()
+        self.copyBefore = version >= PEXPECT_BEFORE
+        if not self.copyBefore:
+            return True
+        return version[0] == 4 and hasattr(self.gatt, "_before")
+
+    def takePriorityLines(self):
+        """ Reads whatever gatttool has written so far into the pexpect
+            buffer, without waiting, then removes whole button notification
+            lines from it and returns them, so that they do not wait behind
+            motion data. Partly read lines are left for later.
+        """
+        if not self.priority:
+            return []
+        buffer = self.gatt.buffer
+        try:
+            while len(buffer) < LOOKAHEAD:
+                buffer += self.gatt.read_nonblocking(self.gatt.maxread, 0)
+        except (pexpect.TIMEOUT, pexpect.EOF):
+            # Nothing more to read. An EOF is seen by the next expect
+            pass
+        lines = []
+        if self.handles["buttons"]["data"] in buffer:
+            lines = self.priorityPattern.findall(buffer)
+            buffer = self.priorityPattern.sub("", buffer)
+        self.gatt.buffer = buffer
+        if self.copyBefore:
+            # See priorityPossible
+            self.gatt._before = self.gatt.buffer_type()
+            self.gatt._before.write(buffer)
+        self.metrics.incr("priority_lines", n=len(lines))
+        return lines
+
     def getValues(self):
         """Continually updates sensor values. Run in a thread.
         """
@@ -429,12 +763,14 @@ class Adaptor(CbAdaptor):
             if self.badCount > 7:
                 self.setState("error")
             if self.sim == 0:
-                index = self.gatt.expect(['handle.*', pexpect.TIMEOUT, pexpect.EOF], timeout=self.gattTimeout)
+                # One whole line at a time, so that lines are never decoded part read
+                index = self.gatt.expect(['handle[^\n]*\n', pexpect.TIMEOUT, pexpect.EOF], timeout=self.gattTimeout)
             else:
                 index = 0
             if index == 1:
                 status = ""
                 self.cbLog("warning", "gatt timeout")
+                self.metrics.incr("gatt_timeouts")
                 # First try to reconnect nicely
                 self.gatt.sendline('connect')
                 index = self.gatt.expect(['successful', pexpect.TIMEOUT, pexpect.EOF], timeout=INIT_TIMEOUT)
@@ -446,6 +782,7 @@ class Adaptor(CbAdaptor):
                     self.sendcharacteristic("connected", self.connected, time.time())
                 else:
                     self.cbLog("warning", "Successful reconnection without kill")
+                    self.metrics.incr("reconnects")
                     status = self.switchSensors()
                     self.cbLog("info", "switchSensors status: " + status)
                 while status != "ok" and not self.doStop:
@@ -454,6 +791,7 @@ class Adaptor(CbAdaptor):
                     status = self.initSensorTag()   
                     self.cbLog("info", "re-init status: " + status)
                     if status == "ok":
+                        self.metrics.incr("reconnects")
                         # Must switch sensors on/off again after re-init
                         status = self.switchSensors()
             elif index == 2:
@@ -462,6 +800,7 @@ class Adaptor(CbAdaptor):
                 # Also report back to manager to allow it to take action. Eg: restart adaptor.
                 if not self.doStop:
                     self.cbLog("debug", "gatt EOF in getValues")
+                    self.metrics.incr("eofs")
                     eofTime = time.time()
                     if eofTime - self.lastEOFTime > EOF_MONITOR_INTERVAL:
                        self.eofCount = 1
@@ -469,63 +808,43 @@ class Adaptor(CbAdaptor):
                        self.eofCount += 1
                     self.lastEOFTime = eofTime
                     if self.eofCount > MAX_EOF_COUNT:
+                        self.metrics.incr("eof_bursts")
+                        if self.pool and self.restartGatt():
+                            continue
                         self.status = "error"
                         break
                 else:
                     break
             else:
+                # Time the line was received from gatttool. Used as the sample timeStamp
+                timeStamp = time.time()
                 if self.badCount > 7:
                     self.setState("reset_error")
                 self.badCount = 0  # Got a value so reset
                 if self.sim == 0:
                     raw = self.gatt.after.split()
+                    # Button presses already written by gatttool behind this line are decoded before it
+                    priority = self.takePriorityLines()
+                    if priority:
+                        raw = " ".join(priority).split() + raw
                 else:
                     raw = self.simValues.getSimValues()
-                timeStamp = time.time()
+                trace = None
+                if self.traceEvery:
+                    self.traceCount += 1
+                    if self.traceCount >= self.traceEvery:
+                        self.traceCount = 0
+                        trace = {"read": timeStamp}
                 handles = True
                 startI = 2
                 while handles:
                     #self.cbLog("debug", "raw data: " + str(raw))
-                    type = raw[startI]
-                    if type.startswith(self.handles["acceleration"]["data"]): 
-                        # Accelerometer descriptor
-                        #self.cbLog("debug", "accel data: " + str(raw[10:16]))
-                        #self.cbLog("debug", "z-accel data: " + str(raw[20:22]))
-                        accel = {}
-                        accel["x"] = self.calcAccel(raw[startI+8:startI+10])
-                        accel["y"] = self.calcAccel(raw[startI+10:startI+12])
-                        accel["z"] = self.calcAccel(raw[startI+12:startI+14])
-                        self.sendcharacteristic("acceleration", accel, timeStamp)
-                    elif type.startswith(self.handles["buttons"]["data"]):
-                        # Button press decriptor
-                        buttons = {"leftButton": (int(raw[startI+2]) & 2) >> 1,
-                                   "rightButton": int(raw[startI+2]) & 1}
-                        self.sendcharacteristic("buttons", buttons, timeStamp)
-                    elif type.startswith(self.handles["temperature"]["data"]):
-                        # Temperature descriptor
-                        objT, ambT = self.calcTemperature(raw[startI+2:startI+6])
-                        self.sendcharacteristic("temperature", ambT, timeStamp)
-                        self.sendcharacteristic("ir_temperature", objT, timeStamp)
-                    elif type.startswith(self.handles["luminance"]["data"]):
-                        luminance = self.calcLuminance(raw[startI+2:startI+4])
-                        self.sendcharacteristic("luminance", luminance, timeStamp)
-                    elif type.startswith(self.handles["humidity"]["data"]):
-                        relHumidity = self.calcHumidity(raw[startI+2:startI+6])
-                        self.sendcharacteristic("humidity", relHumidity, timeStamp)
-                    elif type.startswith("0x0057"):
-                        gyro = {}
-                        gyro["x"] = self.calcGyro(raw[startI+2:startI+4])
-                        gyro["y"] = self.calcGyro(raw[startI+4:startI+6])
-                        gyro["z"] = self.calcGyro(raw[startI+6:startI+8])
-                        self.sendcharacteristic("gyro", gyro, timeStamp)
-                    elif type.startswith(self.handles["magnetometer"]["data"]):
-                        mag = {}
-                        mag["x"] = self.calcMag(raw[startI+2:startI+4])
-                        mag["y"] = self.calcMag(raw[startI+4:startI+6])
-                        mag["z"] = self.calcMag(raw[startI+6:startI+8])
-                        self.sendcharacteristic("magnetometer", mag, timeStamp)
-                    else:
-                       pass
+                    try:
+                        self.decode(raw, startI, timeStamp, trace)
+                    except (ValueError, IndexError):
+                        # A bad line mustn't stop the thread
+                        self.cbLog("debug", "Bad line from gatttool: " + str(raw))
+                        self.metrics.incr("bad_lines")
                     # There may be more than one handle in raw. Remove the
                     # first occurence & if there is another process it
                     raw.remove("handle")
@@ -541,17 +860,225 @@ class Adaptor(CbAdaptor):
         except:
             self.cbLog("error", "Could not kill gatt process")
 
-    def sendcharacteristic(self, characteristic, data, timeStamp):
+    def decode(self, raw, startI, timeStamp, trace):
+        """ Decodes the notification whose handle is at raw[startI].
+        """
+        type = raw[startI]
+        if type.startswith(self.handles["acceleration"]["data"]): 
+            # Accelerometer descriptor
+            #self.cbLog("debug", "accel data: " + str(raw[10:16]))
+            #self.cbLog("debug", "z-accel data: " + str(raw[20:22]))
+            accel = {}
+            accel["x"] = self.calcAccel(raw[startI+8:startI+10])
+            accel["y"] = self.calcAccel(raw[startI+10:startI+12])
+            accel["z"] = self.calcAccel(raw[startI+12:startI+14])
+            self.sendcharacteristic("acceleration", accel, timeStamp, trace)
+        elif type.startswith(self.handles["buttons"]["data"]):
+            # Button press decriptor
+            buttons = {"leftButton": (int(raw[startI+2]) & 2) >> 1,
+                       "rightButton": int(raw[startI+2]) & 1}
+            self.sendcharacteristic("buttons", buttons, timeStamp, trace)
+        elif type.startswith(self.handles["temperature"]["data"]):
+            # Temperature descriptor
+            objT, ambT = self.calcTemperature(raw[startI+2:startI+6])
+            self.sendcharacteristic("temperature", ambT, timeStamp, trace)
+            self.sendcharacteristic("ir_temperature", objT, timeStamp, trace)
+        elif type.startswith(self.handles["luminance"]["data"]):
+            luminance = self.calcLuminance(raw[startI+2:startI+4])
+            self.sendcharacteristic("luminance", luminance, timeStamp, trace)
+        elif type.startswith(self.handles["humidity"]["data"]):
+            relHumidity = self.calcHumidity(raw[startI+2:startI+6])
+            self.sendcharacteristic("humidity", relHumidity, timeStamp, trace)
+        elif type.startswith("0x0057"):
+            gyro = {}
+            gyro["x"] = self.calcGyro(raw[startI+2:startI+4])
+            gyro["y"] = self.calcGyro(raw[startI+4:startI+6])
+            gyro["z"] = self.calcGyro(raw[startI+6:startI+8])
+            self.sendcharacteristic("gyro", gyro, timeStamp, trace)
+        elif type.startswith(self.handles["magnetometer"]["data"]):
+            mag = {}
+            mag["x"] = self.calcMag(raw[startI+2:startI+4])
+            mag["y"] = self.calcMag(raw[startI+4:startI+6])
+            mag["z"] = self.calcMag(raw[startI+6:startI+8])
+            self.sendcharacteristic("magnetometer", mag, timeStamp, trace)
+        else:
+            self.metrics.incr("unknown_handles", type)
+
+    def sendcharacteristic(self, characteristic, data, timeStamp, trace=None):
+        """ trace, if given, is a dict of timestamps for a sampled sample.
+            timeStamp is when the line was read from gatttool.
+        """
         msg = {"id": self.id,
                "content": "characteristic",
                "characteristic": characteristic,
                "data": data,
                "timeStamp": timeStamp}
+        self.metrics.incr("decoded", characteristic)
+        if characteristic in self.events and not trace:
+            trace = {"read": timeStamp}
+        if trace:
+            trace = {"read": trace["read"], "decoded": time.time()}
+            self.metrics.record("decode", characteristic, trace["decoded"] - trace["read"])
+        if self.frameApps[characteristic]:
+            frame.addSample(self.history[characteristic], timeStamp, data, self.historySpan[characteristic])
+        if self.shmApps[characteristic]:
+            # Written once, however many apps are reading
+            if characteristic in spool.FIELDS:
+                self.rings[characteristic].write(timeStamp, [data[f] for f in spool.FIELDS[characteristic]])
+            else:
+                self.rings[characteristic].write(timeStamp, [data])
+            self.metrics.incr("ring_writes", characteristic)
         for a in self.notifyApps[characteristic]:
-            reactor.callFromThread(self.sendMessage, msg, a)
+            if self.inDeadband(a, characteristic, data, timeStamp):
+                continue
+            self.queueForApp(characteristic, msg, a, trace)
         for a in self.pollApps[characteristic]:
-            reactor.callFromThread(self.sensorRead, characteristic)
-            reactor.callFromThread(self.sendMessage, msg, a)
+            self.callFromThread(self.sensorRead, characteristic)
+            if self.inDeadband(a, characteristic, data, timeStamp):
+                continue
+            self.queueForApp(characteristic, msg, a, trace)
+
+    def inDeadband(self, app, characteristic, data, timeStamp):
+        # True if the app has asked not to be sent samples like this one
+        d = self.deadbands.get(app, {}).get(characteristic)
+        if d is None or d.check(data, timeStamp):
+            return False
+        self.metrics.incr("suppressed", app + "/" + characteristic)
+        return True
+
+    def queueForApp(self, characteristic, msg, app, trace):
+        policy = self.policy[app].get(characteristic, self.defaultPolicy[characteristic])
+        # Until the spool is empty, so that the app gets samples in order
+        if self.spooling.get(app) and policy != "never_drop" and characteristic in self.spooled.get(app, []):
+            self.spoolSample(app, msg)
+            return
+        if self.deliveryQueues[app].put(characteristic, (msg, trace), policy):
+            self.callFromThread(self.drainQueue, app)
+
+    def drainQueue(self, app):
+        items = self.deliveryQueues[app].take()
+        for i, (msg, trace) in enumerate(items):
+            try:
+                self.sendToApp(msg, app, trace)
+            except Exception as ex:
+                self.cbLog("warning", "Failed to send to " + app + ": " + str(type(ex)) + " " + str(ex.args))
+                self.metrics.incr("send_failures", app)
+                spooled = False
+                for m, t in items[i:]:
+                    if self.spool and m["characteristic"] in self.spooled.get(app, []):
+                        self.spoolSample(app, m)
+                        spooled = True
+                    else:
+                        self.metrics.incr("dropped", app)
+                if spooled and not self.spooling.get(app):
+                    self.startSpooling(app)
+                return
+
+    def spoolSample(self, app, msg):
+        self.spool.append(app, msg["characteristic"], msg["timeStamp"], msg["data"])
+        self.metrics.incr("spooled", app)
+
+    def startSpooling(self, app):
+        self.spooling[app] = True
+        self.metrics.incr("spool_starts", app)
+        self.callFromThread(self.scheduleFlush, app)
+
+    def scheduleFlush(self, app):
+        # Runs in the reactor. Only one flush of an app's spool runs at a time
+        if app not in self.flushing:
+            self.flushing[app] = reactor.callLater(SPOOL_RETRY, self.flushSpool, app)
+
+    def flushSpool(self, app):
+        """ Tries delivery again, by sending what is in the spool, a segment at
+            a time, oldest first. Samples keep their original time stamps. A
+            segment is only removed from the spool once it has been sent, so
+            if sending fails it is still the oldest when it is tried again.
+        """
+        batch = self.spool.take(app)
+        if batch is None:
+            self.spooling[app] = False
+            # A sample may have been spooled in the getValues thread since take
+            if self.spool.pending(app):
+                self.spooling[app] = True
+                self.flushing[app] = reactor.callLater(0, self.flushSpool, app)
+                return
+            del self.flushing[app]
+            self.cbLog("info", "Spool flushed for " + app)
+            return
+        seq, c, timeStamps, data = batch
+        if not timeStamps:
+            self.spool.remove(seq)
+            self.flushing[app] = reactor.callLater(0, self.flushSpool, app)
+            return
+        msg = {"id": self.id,
+               "content": "characteristic_batch",
+               "characteristic": c,
+               "data": data,
+               "timeStamp": timeStamps}
+        try:
+            self.sendMessage(msg, app)
+        except Exception as ex:
+            self.cbLog("warning", "Failed to flush spool to " + app + ": " + str(type(ex)) + " " + str(ex.args))
+            self.flushing[app] = reactor.callLater(SPOOL_RETRY, self.flushSpool, app)
+            return
+        self.spool.remove(seq)
+        self.metrics.incr("unspooled", app, len(timeStamps))
+        self.flushing[app] = reactor.callLater(0, self.flushSpool, app)
+
+    def sendToApp(self, msg, app, trace=None):
+        # Runs in the reactor
+        if trace:
+            reached = time.time()
+        self.sendMessage(msg, app)
+        self.metrics.incr("sent", app)
+        if self.firstSample is None and msg["characteristic"] != "connected":
+            self.firstSample = time.time() - self.metrics.startTime
+            self.metrics.setGauge("time_to_first_sample", round(self.firstSample, 3))
+            self.cbLog("info", "Time to first sample: " + str(self.firstSample))
+        if trace:
+            delivered = time.time()
+            c = msg["characteristic"]
+            self.metrics.record("reactor", c, reached - trace["decoded"])
+            self.metrics.record("send", c, delivered - reached)
+            self.metrics.record("total", c, delivered - trace["read"])
+            if c == "buttons":
+                # From when the press was read from gatttool. tests/test_priority.py measures from the press itself
+                self.metrics.record("press_to_delivery", app, delivered - trace["read"])
+
+    def startFrame(self, app, f):
+        # Runs in the reactor
+        if self.frames.get(app) is f and not f.call:
+            f.call = reactor.callLater(f.interval, self.sendFrame, app, f)
+
+    def stopFrame(self, f):
+        if f.call and f.call.active():
+            f.call.cancel()
+
+    def sendFrame(self, app, f):
+        if self.frames.get(app) is not f:
+            return
+        now = time.time()
+        f.call = reactor.callLater(f.interval, self.sendFrame, app, f)
+        if self.state != "running":
+            return
+        timeStamp, data = f.build(self.history, now)
+        msg = {"id": self.id,
+               "content": "characteristic",
+               "characteristic": "frame",
+               "data": data,
+               "timeStamp": timeStamp}
+        self.queueForApp("frame", msg, app, None)
+
+    def openRing(self, characteristic):
+        # Creates the shared memory ring for characteristic, if it is not there already
+        if characteristic not in self.rings:
+            try:
+                name = "cb_sensortag_" + self.id + "_" + characteristic
+                self.rings[characteristic] = shmring.ShmRing(name, spool.FIELDS.get(characteristic, ["value"]), SHM_RING_RECORDS)
+            except Exception as ex:
+                self.cbLog("warning", "Could not open ring for " + characteristic + ": " + str(type(ex)) + " " + str(ex.args))
+                return False
+        return True
 
     def onAppInit(self, message):
         """
@@ -580,7 +1107,9 @@ class Adaptor(CbAdaptor):
                             {"characteristic": "connected",
                              "interval": 0},
                             {"characteristic": "buttons",
-                             "interval": 0}],
+                             "interval": 0},
+                            {"characteristic": "frame",
+                             "interval": 1.0}],
                 "content": "service"}
         self.sendMessage(resp, message["id"])
         
@@ -593,8 +1122,62 @@ class Adaptor(CbAdaptor):
         for a in self.pollApps:
             if message["id"] in self.pollApps[a]:
                 self.pollApps[a].remove(message["id"])
+        for a in self.frameApps:
+            if message["id"] in self.frameApps[a]:
+                self.frameApps[a].remove(message["id"])
+        for a in self.shmApps:
+            if message["id"] in self.shmApps[a]:
+                self.shmApps[a].remove(message["id"])
+        if message["id"] in self.frames:
+            reactor.callFromThread(self.stopFrame, self.frames.pop(message["id"]))
+        if message["id"] not in self.deliveryQueues:
+            self.deliveryQueues[message["id"]] = DeliveryQueue(message["id"], DELIVERY_QUEUE_LENGTH, self.metrics)
+        self.policy[message["id"]] = {}
+        deadbands = {}
+        spooled = []
         # Now update details based on the message
         for f in message["service"]:
+            if "deadband" in f or "relative_deadband" in f or "max_interval" in f:
+                if f["characteristic"] in ("buttons", "connected"):
+                    self.cbLog("warning", "Deadband ignored for " + f["characteristic"])
+                else:
+                    deadbands[f["characteristic"]] = Deadband(f.get("deadband", 0), f.get("relative_deadband", 0),
+                                                              f.get("max_interval", 0))
+            if f["characteristic"] == "frame":
+                # One message every interval with the latest values of several characteristics
+                characteristics = [c for c in f.get("characteristics", []) if c in self.frameApps]
+                if not characteristics or f["interval"] <= 0:
+                    self.cbLog("warning", "Bad frame request from " + message["id"])
+                    continue
+                for c in characteristics:
+                    self.frameApps[c].append(message["id"])
+                    if f["interval"] < self.pollInterval[c]:
+                        self.pollInterval[c] = f["interval"]
+                self.frames[message["id"]] = frame.Frame(f["interval"], characteristics, f.get("interpolate", False))
+                reactor.callFromThread(self.startFrame, message["id"], self.frames[message["id"]])
+                continue
+            if f.get("transport") == "shm" and self.openRing(f["characteristic"]):
+                self.shmApps[f["characteristic"]].append(message["id"])
+                if f["interval"] < self.pollInterval[f["characteristic"]]:
+                    self.pollInterval[f["characteristic"]] = f["interval"]
+                msg = {"id": self.id,
+                       "content": "ring",
+                       "characteristic": f["characteristic"],
+                       "ring": self.rings[f["characteristic"]].announcement()}
+                reactor.callFromThread(self.sendMessage, msg, message["id"])
+                continue
+            if f.get("spool"):
+                # Samples that can't be sent are kept on disk and sent later, in
+                # "characteristic_batch" messages with lists of data and timeStamp
+                spooled.append(f["characteristic"])
+            if "policy" in f:
+                if f["characteristic"] in self.events:
+                    # Events are never dropped
+                    self.cbLog("warning", "Policy ignored for " + f["characteristic"])
+                elif f["policy"] in POLICIES:
+                    self.policy[message["id"]][f["characteristic"]] = f["policy"]
+                else:
+                    self.cbLog("warning", "Unknown policy: " + str(f["policy"]) + " for " + f["characteristic"])
             if f["interval"] < MAX_NOTIFY_INTERVAL:
                 if message["id"] not in self.notifyApps[f["characteristic"]]:
                     self.notifyApps[f["characteristic"]].append(message["id"])
@@ -605,10 +1188,18 @@ class Adaptor(CbAdaptor):
             else:
                 if message["id"] not in self.pollApps[f["characteristic"]]:
                     self.pollApps[f["characteristic"]].append(message["id"])
+                    tolerance = f.get("tolerance", POLL_TOLERANCE * f["interval"])
+                    if not 0 <= tolerance <= f["interval"]/2.0:
+                        self.cbLog("warning", "Tolerance " + str(tolerance) + " out of range for " + f["characteristic"])
+                        tolerance = max(0, min(tolerance, f["interval"]/2.0))
+                    if tolerance < self.pollTolerance.get(f["characteristic"], tolerance + 1):
+                        self.pollTolerance[f["characteristic"]] = tolerance
                     if f["interval"] < self.pollInterval[f["characteristic"]]:
                         self.pollInterval[f["characteristic"]] = f["interval"]
                     #if self.pollInterval[f["characteristic"]] < 60:
                     #    self.pollInterval[f["characteristic"]] = 60
+        self.deadbands[message["id"]] = deadbands
+        self.spooled[message["id"]] = spooled
         self.checkAllProcessed(message["id"])
 
     def onConfigureMessage(self, config):
@@ -619,7 +1210,21 @@ class Adaptor(CbAdaptor):
         if not self.configured:
             if self.sim != 0:
                 self.simValues = SimValues()
-            self.connectSensorTag()
+            elif self.supervise:
+                self.pool = supervisor.AdapterPool(supervisor.findAdapters(self.device))
+                self.device = self.pool.assign(self.addr)
+                self.cbLog("info", "Using adapter " + self.device)
+            try:
+                self.spool = spool.Spool(os.path.join(os.getenv("CB_SENSORTAG_SPOOL_DIR", SPOOL_DIR), self.id),
+                                   SPOOL_MAX_BYTES, SPOOL_SEGMENT)
+                for app in os.listdir(self.spool.directory):
+                    # Left from a previous run
+                    if app in self.appInstances:
+                        self.scheduleFlush(app)
+            except Exception as ex:
+                self.cbLog("warning", "No spool. " + str(type(ex)) + " " + str(ex.args))
+            # Connect in a thread so that it happens at the same time as apps are configured
+            reactor.callInThread(self.connectSensorTag)
 
 if __name__ == '__main__':
     adaptor = Adaptor(sys.argv)
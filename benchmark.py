@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# benchmark.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+# Compares converting SensorTag payloads one at a time, with read(), against
+# converting them all at once with decode(). Needs numpy. Eg:
+#   python benchmark.py -n 100000
+# With --startup, instead times the adaptor from being started to the first
+# sample reaching an app, with fakegatttool standing in for the tag. Needs
+# the bridge's cbcommslib and twisted. Eg:
+#   python benchmark.py --startup --runs 5
+#
+import os
+import sys
+import time
+import random
+import struct
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+class Replay():
+    # Stands in for a characteristic, returning captured payloads in turn
+    def __init__(self, buffers):
+        self.buffers = buffers
+        self.i = 0
+
+    def read(self):
+        b = self.buffers[self.i]
+        self.i += 1
+        return b
+
+def payloads(n, size):
+    return [struct.pack("%dB" % size, *[random.randint(0, 255) for i in range(size)]) for j in range(n)]
+
+def irPayloads(n, size):
+    # Random bytes would often be outside the range of the thermopile model
+    return [struct.pack("<hh", random.randint(-300, 300), random.randint(15*128, 35*128)) for j in range(n)]
+
+def calibrate(barometer):
+    # Typical calibration, as it would be read by enable()
+    (c1,c2,c3,c4,c5,c6,c7,c8) = (45000, 25000, 45000, 8000, -1000, 40000, -500, 10000)
+    barometer.c1_s = c1/float(1 << 24)
+    barometer.c2_s = c2/float(1 << 10)
+    barometer.sensPoly = [ c3/1.0, c4/float(1 << 17), c5/float(1<<34) ]
+    barometer.offsPoly = [ c6*float(1<<14), c7/8.0, c8/float(1<<19) ]
+
+def decode(args):
+    # Imported here so that --startup doesn't need bluepy
+    from bluepytag import IRTemperatureSensor, AccelerometerSensor, HumiditySensor, \
+                          MagnetometerSensor, BarometerSensor, GyroscopeSensor
+    sensors = [(IRTemperatureSensor(None), 4, irPayloads),
+               (AccelerometerSensor(None), 3, payloads),
+               (HumiditySensor(None), 4, payloads),
+               (MagnetometerSensor(None), 6, payloads),
+               (BarometerSensor(None), 4, payloads),
+               (GyroscopeSensor(None), 6, payloads)]
+    print("%-20s %12s %12s %8s" % ("sensor", "read (us)", "decode (us)", "speedup"))
+    for sensor, size, generate in sensors:
+        if isinstance(sensor, BarometerSensor):
+            calibrate(sensor)
+        buffers = generate(args.n, size)
+        sensor.data = Replay(buffers)
+        start = time.time()
+        for i in range(args.n):
+            sensor.read()
+        perSample = (time.time() - start) / args.n
+        start = time.time()
+        sensor.decode(buffers)
+        batch = (time.time() - start) / args.n
+        print("%-20s %12.3f %12.3f %7.1fx" % (type(sensor).__name__, perSample * 1e6, batch * 1e6, perSample / batch))
+
+def startupRun(args):
+    """ One run of the adaptor, in this process. Prints the time taken to
+        import it and from then to the first sample. The bridge's part is
+        done by hand: configuring straight away and the app asking for
+        acceleration after --config-delay.
+    """
+    spoolDir = tempfile.mkdtemp()
+    os.environ["CB_SENSORTAG_SPOOL_DIR"] = spoolDir
+    os.environ["CB_SENSORTAG_GATTTOOL"] = sys.executable + " " + \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakegatttool.py") + \
+        " --rate 10 --connect-time " + str(args.connect_time)
+    start = time.time()
+    import adaptor_a
+    imported = time.time()
+    from twisted.internet import reactor
+    adaptor_a.CbAdaptor.__init__ = lambda self, argv: None
+    adaptor = adaptor_a.Adaptor([])
+    adaptor.id = "benchmark"
+    adaptor.addr = "A0:E6:F8:00:00:01"
+    adaptor.device = "hci0"
+    adaptor.sim = 0
+    adaptor.doStop = False
+    adaptor.configured = False
+    adaptor.appInstances = ["app"]
+    adaptor.cbLog = lambda level, msg: None
+    adaptor.sendManagerMessage = lambda msg: None
+    first = []
+    def sendMessage(msg, app):
+        if msg.get("characteristic") not in (None, "connected") and not first:
+            first.append(time.time())
+            adaptor.onStop()
+            adaptor.doStop = True
+            reactor.stop()
+    adaptor.sendMessage = sendMessage
+    def request():
+        time.sleep(args.config_delay)
+        adaptor.onAppRequest({"id": "app",
+                              "service": [{"characteristic": "acceleration", "interval": 0.1}]})
+    def timeout():
+        adaptor.doStop = True
+        reactor.stop()
+    reactor.callWhenRunning(adaptor.onConfigureMessage, {})
+    reactor.callWhenRunning(reactor.callInThread, request)
+    reactor.callLater(args.timeout, timeout)
+    reactor.run()
+    try:
+        adaptor.gatt.kill(9)
+    except Exception:
+        pass
+    shutil.rmtree(spoolDir, ignore_errors=True)
+    if first:
+        print("%.3f %.3f" % (imported - start, first[0] - imported))
+    else:
+        print("timeout")
+
+def startup(args):
+    # Each run is a new process, so that the adaptor is imported from scratch
+    print("%-6s %12s %20s" % ("run", "import (s)", "first sample (s)"))
+    for run in range(args.runs):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--startup-run",
+                                          "--connect-time", str(args.connect_time),
+                                          "--config-delay", str(args.config_delay),
+                                          "--timeout", str(args.timeout)])
+        fields = output.decode("utf-8").split()
+        if fields[-1] == "timeout":
+            print("%-6d %12s %20s" % (run, "", "timeout"))
+        else:
+            print("%-6d %12s %20s" % (run, fields[-2], fields[-1]))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=100000, help='Payloads per sensor')
+    parser.add_argument('--startup', action='store_true', help='Time to the first sample, instead of decoding')
+    parser.add_argument('--startup-run', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--runs', type=int, default=5, help='Startup runs')
+    parser.add_argument('--connect-time', type=float, default=1.0, help='Seconds fakegatttool takes to connect')
+    parser.add_argument('--config-delay', type=float, default=0.5, help='Seconds before the app asks for samples')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for the first sample')
+    args = parser.parse_args()
+    if args.startup_run:
+        startupRun(args)
+    elif args.startup:
+        startup(args)
+    else:
+        decode(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
 from btle import UUID, Peripheral, DefaultDelegate
 import struct
 import math
+try:
+    import numpy
+except ImportError:
+    numpy = None    # Only needed for decode()
 
 def _TI_UUID(val):
     return UUID("%08X-0451-4000-b000-000000000000" % (0xF0000000+val))
@@ -33,7 +37,16 @@ class SensorBase:
         if self.ctrl is not None:
             self.ctrl.write(self.sensorOff)
 
+    def _raw(self, buffers, dtype):
+        '''Unpacks many raw payloads, each one record of dtype, in one go'''
+        if numpy is None:
+            raise ImportError("decode() needs numpy")
+        return numpy.frombuffer(b"".join(buffers), dtype=numpy.dtype(dtype))
+
     # Derived class should implement _formatData()
+    # Derived classes also implement decode(buffers), which converts a list of
+    # raw payloads, eg: a burst of notifications, in one numpy pass and returns
+    # an array with a row for each payload.
 
 def calcPoly(coeffs, x):
     return coeffs[0] + (coeffs[1]*x) + (coeffs[2]*x*x)
@@ -70,6 +83,25 @@ class IRTemperatureSensor(SensorBase):
         return (float(rawTamb)/128, float(rawVobj)/128)
         #return (tAmb, tObj - self.zeroC)
 
+    def decode(self, buffers):
+        '''Returns rows of (ambient_temp, target_temp) in degC, using the thermopile model.
+           target_temp is NaN in rows that are outside the model, where read() would
+           raise ValueError'''
+        raw = self._raw(buffers, [('vobj', '<i2'), ('tamb', '<i2')])
+        tAmb = raw['tamb'] / 128.0
+        Vobj = 1.5625e-7 * raw['vobj']
+
+        tDie = tAmb + self.zeroC
+        S   = self.S0 * calcPoly(self.Apoly, tDie-self.tRef)
+        Vos = calcPoly(self.Bpoly, tDie-self.tRef)
+        fObj = calcPoly(self.Cpoly, Vobj-Vos)
+
+        radicand = numpy.power(tDie,4.0) + (fObj/S)
+        valid = radicand >= 0
+        tObj = numpy.full(len(radicand), numpy.nan)
+        tObj[valid] = numpy.power(radicand[valid], 0.25)
+        return numpy.column_stack((tAmb, tObj - self.zeroC))
+
 
 class AccelerometerSensor(SensorBase):
     svcUUID  = _TI_UUID(0xAA10)
@@ -84,6 +116,10 @@ class AccelerometerSensor(SensorBase):
         x_y_z = struct.unpack('bbb', self.data.read())
         return tuple([ (val/64.0) for val in x_y_z ])
 
+    def decode(self, buffers):
+        '''Returns rows of (x_accel, y_accel, z_accel) in units of g'''
+        return self._raw(buffers, 'i1').reshape(-1, 3) / 64.0
+
 class HumiditySensor(SensorBase):
     svcUUID  = _TI_UUID(0xAA20)
     dataUUID = _TI_UUID(0xAA21)
@@ -101,6 +137,13 @@ class HumiditySensor(SensorBase):
         RH = 100 * ((rawH & 0xFFFC)/65536.0)
         return (temp, RH)
 
+    def decode(self, buffers):
+        '''Returns rows of (ambient_temp, rel_humidity)'''
+        raw = self._raw(buffers, [('t', '<u2'), ('h', '<u2')])
+        temp = -40.00 + 165.00 * (raw['t'] / 65536.0)
+        RH = 100 * ((raw['h'] & 0xFFFC)/65536.0)
+        return numpy.column_stack((temp, RH))
+
 
 class MagnetometerSensor(SensorBase):
     svcUUID  = _TI_UUID(0xAA30)
@@ -116,6 +159,10 @@ class MagnetometerSensor(SensorBase):
         return tuple([ 1000.0 * (v/32768.0) for v in x_y_z ])
         # Revisit - some absolute calibration is needed
 
+    def decode(self, buffers):
+        '''Returns rows of (x, y, z) in uT units'''
+        return 1000.0 * (self._raw(buffers, '<i2').reshape(-1, 3) / 32768.0)
+
 class BarometerSensor(SensorBase):
     svcUUID  = _TI_UUID(0xAA40)
     dataUUID = _TI_UUID(0xAA41)
@@ -149,6 +196,16 @@ class BarometerSensor(SensorBase):
         pres = (sens * rawP + offs) / (100.0 * float(1<<14))
         return (temp,pres)
 
+    def decode(self, buffers):
+        '''Returns rows of (ambient_temp, pressure_millibars), using this tag's calibration'''
+        raw = self._raw(buffers, [('t', '<i2'), ('p', '<u2')])
+        rawT = raw['t'].astype(float)
+        temp = (self.c1_s * rawT) + self.c2_s
+        sens = calcPoly( self.sensPoly, rawT )
+        offs = calcPoly( self.offsPoly, rawT )
+        pres = (sens * raw['p'] + offs) / (100.0 * float(1<<14))
+        return numpy.column_stack((temp, pres))
+
 
 class GyroscopeSensor(SensorBase):
     svcUUID  = _TI_UUID(0xAA50)
@@ -164,6 +221,10 @@ class GyroscopeSensor(SensorBase):
         x_y_z = struct.unpack('<hhh', self.data.read())
         return tuple([ 250.0 * (v/32768.0) for v in x_y_z ])
 
+    def decode(self, buffers):
+        '''Returns rows of (x,y,z) rate in deg/sec'''
+        return 250.0 * (self._raw(buffers, '<i2').reshape(-1, 3) / 32768.0)
+
 class KeypressSensor(SensorBase):
     svcUUID = UUID(0xFFE0)
     dataUUID = UUID(0xFFE1)
@@ -177,6 +238,10 @@ class KeypressSensor(SensorBase):
     def disable(self):
         self.periph.writeCharacteristic(0x60, struct.pack('<bb', 0x00, 0x00))
 
+    def decode(self, buffers):
+        '''Returns the button bits of each notification'''
+        return self._raw(buffers, 'u1') & KeypressDelegate.ALL_BUTTONS
+
 class SensorTag(Peripheral):
     def __init__(self,addr):
         Peripheral.__init__(self,addr)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# delivery.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+import threading
+import math
+from collections import deque
+
+POLICIES = ["latest", "drop_oldest", "never_drop"]
+
+class DeliveryQueue():
+    """ Bounded queue of messages waiting to go to one app.
+        latest:      only the newest value of a characteristic is kept.
+        drop_oldest: a stream of up to maxLength samples, oldest dropped first.
+        never_drop:  events. Kept however many there are, and delivered first.
+        put is called from the getValues thread and take from the reactor.
+    """
+    def __init__(self, app, maxLength, metrics):
+        self.app = app
+        self.maxLength = maxLength
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.events = deque()
+        self.stream = deque()
+        self.latest = {}
+        self.scheduled = False
+
+    def put(self, characteristic, item, policy):
+        """ Returns True if the caller needs to schedule a drain in the reactor.
+        """
+        with self.lock:
+            if policy == "latest":
+                if characteristic in self.latest:
+                    self.metrics.incr("dropped", self.app)
+                self.latest[characteristic] = item
+            elif policy == "never_drop":
+                self.events.append(item)
+            else:
+                if len(self.stream) >= self.maxLength:
+                    self.stream.popleft()
+                    self.metrics.incr("dropped", self.app)
+                self.stream.append(item)
+            if self.scheduled:
+                return False
+            self.scheduled = True
+            return True
+
+    def take(self):
+        with self.lock:
+            items = list(self.events) + list(self.stream) + list(self.latest.values())
+            self.events.clear()
+            self.stream.clear()
+            self.latest = {}
+            self.scheduled = False
+        return items
+
+    def full(self):
+        return len(self.stream) >= self.maxLength
+
+    def __len__(self):
+        return len(self.events) + len(self.stream) + len(self.latest)
+
+class Deadband():
+    """ Report-by-exception filter for one characteristic of one app.
+        A sample is sent if it differs from the last one sent by more than
+        absolute, or by more than relative * the last value sent, or if
+        nothing has been sent for maxInterval seconds. For x, y, z
+        characteristics, the norm of the vector is used.
+    """
+    def __init__(self, absolute=0, relative=0, maxInterval=0):
+        self.absolute = absolute
+        self.relative = relative
+        self.maxInterval = maxInterval
+        self.last = None
+        self.lastTime = 0
+
+    def check(self, data, timeStamp):
+        if isinstance(data, dict):
+            v = math.sqrt(sum([data[k]*data[k] for k in ("x", "y", "z")]))
+        else:
+            v = data
+        if self.last is None:
+            send = True
+        elif self.maxInterval and timeStamp - self.lastTime >= self.maxInterval:
+            send = True
+        else:
+            send = abs(v - self.last) > max(self.absolute, self.relative * abs(self.last))
+        if send:
+            self.last = v
+            self.lastTime = timeStamp
+        return send
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# fakegatttool.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+# Stands in for "gatttool --interactive" talking to a SensorTag, so that the
+# adaptor can be run without a tag or a Bluetooth adapter. Use it with:
+#   CB_SENSORTAG_GATTTOOL="python fakegatttool.py --rate 100"
+# It accepts and ignores gatttool's -i, -b and --interactive arguments.
+# With --press-log, the time of each button press is written to a file, so
+# that how long presses take to reach apps can be measured from when they
+# happen. tests/test_priority.py does this with movement at 100 Hz.
+#
+import os
+import sys
+import time
+import random
+import select
+import argparse
+
+# Notification payload lengths, by data handle
+PAYLOAD = {0x21: 4,     # temperature
+           0x29: 4,     # humidity
+           0x39: 18,    # movement (gyro, accel, magnetometer)
+           0x41: 2,     # luminance
+           0x46: 6,     # magnetometer
+           0x49: 1}     # buttons
+MOVEMENT = 0x39
+BUTTONS = 0x49
+
+def out(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+def notify(handle, payload):
+    out("Notification handle = " + format(handle, "#06x") + " value: " + " ".join(["%02x" % b for b in payload]))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', dest='adapter', default='hci0')
+    parser.add_argument('-b', dest='addr', default='00:00:00:00:00:00')
+    parser.add_argument('--interactive', action='store_true')
+    parser.add_argument('--period', type=float, default=1.0, help='Seconds between notifications for slow sensors')
+    parser.add_argument('--rate', type=float, default=10.0, help='Movement notifications per second')
+    parser.add_argument('--buttons', type=float, default=0, help='Seconds between button presses. 0 = none')
+    parser.add_argument('--crash-after', type=float, default=0, help='Exit abruptly after this many seconds. 0 = never')
+    parser.add_argument('--fail-connect', type=float, default=0, help='Probability that a connect fails')
+    parser.add_argument('--connect-time', type=float, default=0, help='Seconds a connect takes')
+    parser.add_argument('--press-log', help='File to write the time of each button press to')
+    args = parser.parse_args()
+
+    start = time.time()
+    connected = False
+    enabled = {}            # data handle: next notification time
+    nextPress = None
+    pressLog = None
+    if args.press_log:
+        pressLog = open(args.press_log, "a")
+    pending = b""           # stdin is read unbuffered so that select sees every line
+    out("[" + args.addr + "][LE]> ")
+    while True:
+        now = time.time()
+        if args.crash_after and now - start > args.crash_after:
+            sys.exit(1)
+        wait = 0.1
+        if enabled:
+            wait = max(0, min(min(enabled.values()) - now, wait))
+        r, w, e = select.select([sys.stdin], [], [], wait)
+        lines = []
+        if r:
+            data = os.read(sys.stdin.fileno(), 4096)
+            if not data:
+                break
+            pending += data
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                lines.append(line.decode("utf-8"))
+        for line in lines:
+            cmd = line.split()
+            if not cmd:
+                continue
+            if cmd[0] == "connect":
+                out("Attempting to connect to " + args.addr)
+                time.sleep(args.connect_time)
+                if random.random() >= args.fail_connect:
+                    connected = True
+                    out("Connection successful")
+                    if args.buttons:
+                        nextPress = time.time() + args.buttons
+            elif cmd[0] in ("char-write-req", "char-write-cmd") and connected:
+                handle = int(cmd[1], 16)
+                if cmd[0] == "char-write-req":
+                    out("Characteristic value was written successfully")
+                # Writing 0100 to a notify handle starts notifications from the data handle before it.
+                # Buttons only notify when pressed
+                if len(cmd) > 2 and handle - 1 in PAYLOAD and handle - 1 != BUTTONS:
+                    if cmd[2] == "0100":
+                        enabled[handle - 1] = time.time()
+                    elif cmd[2] == "0000":
+                        enabled.pop(handle - 1, None)
+            elif cmd[0] in ("exit", "quit"):
+                return
+        now = time.time()
+        for h in enabled:
+            if now >= enabled[h]:
+                notify(h, [random.randint(0, 255) for i in range(PAYLOAD[h])])
+                if h == MOVEMENT:
+                    enabled[h] += 1.0/args.rate
+                else:
+                    enabled[h] += args.period
+                # Don't try to catch up after a stall
+                if enabled[h] < now:
+                    enabled[h] = now
+        if nextPress and now >= nextPress:
+            if pressLog:
+                pressLog.write(repr(time.time()) + "\n")
+                pressLog.flush()
+            notify(BUTTONS, [1])
+            notify(BUTTONS, [0])
+            nextPress += args.buttons
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# frame.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+def lerp(v0, v1, f):
+    if isinstance(v0, dict):
+        v = {}
+        for k in v0:
+            v[k] = v0[k] + (v1[k] - v0[k]) * f
+        return v
+    return v0 + (v1 - v0) * f
+
+def addSample(samples, timeStamp, data, span):
+    """ Appends to samples, a deque, and removes those no longer needed.
+        The newest sample at or before the start of the span is kept, so
+        that there is one either side of any time in it.
+    """
+    samples.append((timeStamp, data))
+    while len(samples) > 1 and samples[1][0] <= timeStamp - span:
+        samples.popleft()
+
+class Frame():
+    """ What one app has asked for in a "frame" characteristic: every
+        interval seconds, one message with a value for each of
+        characteristics, and how old it is.
+        Without interpolate, each value is the latest sample.
+        With interpolate, all values are for the same time: that of the
+        oldest of the latest samples, so nothing is extrapolated. Other
+        characteristics are interpolated between the samples either side.
+        Events are not interpolated and do not set the time: their value is
+        the last one at or before it. A characteristic with no sample at or
+        before the time is None, rather than given a value from another time.
+    """
+    # Events, which can't be interpolated
+    DISCRETE = ("buttons", "connected")
+
+    def __init__(self, interval, characteristics, interpolate=False):
+        self.interval = interval
+        self.characteristics = characteristics
+        self.interpolate = interpolate
+        self.call = None    # The reactor call that will send the next frame
+
+    def span(self, periods):
+        """ periods is {characteristic: seconds between its samples}. Returns
+            how many seconds of history each characteristic needs: the time
+            interpolated to may be up to a period of the slowest one before
+            its latest sample, which may itself be late, and is a frame
+            interval older by the time the frame is built.
+        """
+        if not self.interpolate:
+            return 0
+        slowest = max([0] + [periods[c] for c in self.characteristics if c not in self.DISCRETE])
+        return self.interval + 2 * slowest
+
+    def build(self, history, now):
+        """ history is {characteristic: [(timeStamp, data), ...]}, oldest first.
+            Returns (timeStamp, data) for the frame message.
+        """
+        latest = {}
+        for c in self.characteristics:
+            if history[c]:
+                latest[c] = history[c][-1]
+        data = {}
+        if not self.interpolate or not latest:
+            for c in self.characteristics:
+                if c in latest:
+                    data[c] = {"value": latest[c][1], "age": now - latest[c][0]}
+                else:
+                    data[c] = None
+            return now, data
+        continuous = [latest[c][0] for c in latest if c not in self.DISCRETE]
+        if continuous:
+            t = min(continuous)
+        else:
+            t = now
+        for c in self.characteristics:
+            data[c] = None
+            if c not in latest:
+                continue
+            samples = list(history[c])
+            for i in range(len(samples)):
+                t0, v0 = samples[i]
+                if t0 > t:
+                    break
+                value = v0
+                if i + 1 < len(samples) and c not in self.DISCRETE:
+                    t1, v1 = samples[i+1]
+                    if t0 < t < t1:
+                        value = lerp(v0, v1, (t - t0)/(t1 - t0))
+                data[c] = {"value": value, "age": now - t}
+        return t, data
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# metrics.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+import threading
+import time
+
+class LatencyHistogram():
+    """ Log-linear buckets in the style of HdrHistogram. Values are held in
+        microseconds to SIG_BITS significant bits, so the relative error of
+        any percentile is bounded at about 1/2**SIG_BITS whatever its size.
+    """
+    SIG_BITS = 5
+
+    def __init__(self):
+        self.counts = {}    # bucket lower bound (us): count
+        self.count = 0
+        self.max = 0
+
+    def record(self, seconds):
+        us = int(seconds * 1000000)
+        if us < 0:
+            us = 0
+        shift = us.bit_length() - self.SIG_BITS
+        if shift > 0:
+            bucket = (us >> shift) << shift
+        else:
+            bucket = us
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, p):
+        target = self.count * p / 100.0
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return bucket
+        return self.max
+
+    def summary(self):
+        # Reported in ms
+        return {"count": self.count,
+                "p50": self.percentile(50)/1000.0,
+                "p90": self.percentile(90)/1000.0,
+                "p99": self.percentile(99)/1000.0,
+                "max": self.max/1000.0}
+
+class Metrics():
+    """ Counters and gauges describing what the adaptor is doing.
+        Updated from both the getValues thread and the reactor, so all
+        access is under one lock. Each update is a dictionary lookup and
+        an add, so it is cheap enough to leave on all the time.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}      # name: count or name: {key: count}
+        self.gauges = {}        # name: value
+        self.lastCounters = {}  # Counters at the last report, used for rates
+        self.latency = {}       # stage: {key: LatencyHistogram}, cleared at each report
+        self.startTime = time.time()
+        self.lastReport = self.startTime
+
+    def incr(self, name, key=None, n=1):
+        with self.lock:
+            if key is None:
+                self.counters[name] = self.counters.get(name, 0) + n
+            else:
+                c = self.counters.setdefault(name, {})
+                c[key] = c.get(key, 0) + n
+
+    def adjust(self, name, n):
+        with self.lock:
+            self.gauges[name] = self.gauges.get(name, 0) + n
+
+    def setGauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def record(self, stage, key, seconds):
+        with self.lock:
+            s = self.latency.setdefault(stage, {})
+            if key not in s:
+                s[key] = LatencyHistogram()
+            s[key].record(seconds)
+
+    def snapshot(self):
+        """ Returns a copy of everything, plus per-key rates (per second)
+            since the last snapshot. Starts a new rate interval.
+        """
+        with self.lock:
+            now = time.time()
+            interval = now - self.lastReport
+            counters = {}
+            rates = {}
+            for name, c in self.counters.items():
+                if isinstance(c, dict):
+                    counters[name] = dict(c)
+                    last = self.lastCounters.get(name, {})
+                    if interval > 0:
+                        rates[name] = {}
+                        for k in c:
+                            rates[name][k] = round((c[k] - last.get(k, 0))/interval, 3)
+                else:
+                    counters[name] = c
+            snap = {"uptime": round(now - self.startTime, 1),
+                    "interval": round(interval, 1),
+                    "counters": counters,
+                    "gauges": dict(self.gauges),
+                    "rates": rates}
+            if self.latency:
+                snap["latency"] = {}
+                for stage, s in self.latency.items():
+                    snap["latency"][stage] = {}
+                    for k, h in s.items():
+                        snap["latency"][stage][k] = h.summary()
+                self.latency = {}
+            self.lastCounters = counters
+            self.lastReport = now
+        return snap
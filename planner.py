@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# planner.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+# Rough CC2650 SensorTag power figures, used to compare configurations
+# rather than to predict battery life exactly.
+BATTERY_CAPACITY = 240000000  # CR2032 (uA.s)
+BASE_CURRENT = 15             # Connected, with everything else asleep (uA)
+WAKE_CHARGE = 50              # Radio & MCU wake for a connection event with traffic (uA.s)
+WRITE_CHARGE = 20             # One write from the bridge (uA.s)
+NOTIFY_CHARGE = 20            # One notification to the bridge (uA.s)
+SENSOR_CURRENT = {"temperature": 270,     # While the sensor is on (uA)
+                  "humidity": 190,
+                  "luminance": 2,
+                  "acceleration": 450,
+                  "gyro": 3200,
+                  "magnetometer": 280}
+POLL_WRITES = 5               # Per sensor per poll: period, enable, notify on; then notify & enable off
+PLAN_HORIZON = 86400          # Time over which a plan is simulated to estimate drain (sec)
+
+class DutyPlanner():
+    """ Decides when to wake the tag for sensors that are polled.
+        Each sensor has an interval and a tolerance: it may be read up to
+        tolerance seconds either side of when it is due. The tag is woken
+        at the last moment the most urgent sensor can wait until, and every
+        other sensor whose window has opened by then is read at the same
+        time. So sensors with unrelated intervals share wakes whenever
+        their tolerances allow it. Reads stay on each sensor's own schedule,
+        so wakes shared early or late do not make intervals drift.
+    """
+    def __init__(self):
+        self.sensors = {}   # sensor: [interval, tolerance, due]
+
+    def set(self, sensor, interval, tolerance, now):
+        tolerance = max(0, min(tolerance, interval/2.0))
+        if sensor in self.sensors:
+            self.sensors[sensor][0:2] = [interval, tolerance]
+        else:
+            # Read new sensors straight away
+            self.sensors[sensor] = [interval, tolerance, now - tolerance]
+
+    def remove(self, sensor):
+        self.sensors.pop(sensor, None)
+
+    def nextWake(self, sensors=None):
+        if sensors is None:
+            sensors = self.sensors
+        if not sensors:
+            return None
+        return min([s[2] + s[1] for s in sensors.values()])
+
+    def _wake(self, sensors, now):
+        w = self.nextWake(sensors)
+        if w is None or now < w:
+            return []
+        woken = []
+        for sensor, s in sensors.items():
+            if s[2] - s[1] <= now:
+                woken.append(sensor)
+                # Keep to the original schedule, unless reads have been missed
+                s[2] += s[0]
+                if s[2] + s[1] < now:
+                    s[2] = now + s[0]
+        return woken
+
+    def due(self, now):
+        """ Returns the sensors to switch on now, if any.
+        """
+        return self._wake(self.sensors, now)
+
+    def estimate(self, notify, onTime):
+        """ Estimated drain. notify is {sensor: seconds between notifications}
+            for sensors that are always on. onTime is {sensor: seconds} a
+            polled sensor stays on for each read.
+            Returns average current (uA), wakes per hour & battery life (days).
+        """
+        charge = BASE_CURRENT * float(PLAN_HORIZON)
+        for sensor, period in notify.items():
+            charge += SENSOR_CURRENT.get(sensor, 0) * PLAN_HORIZON
+            charge += NOTIFY_CHARGE * PLAN_HORIZON / max(period, 0.01)
+        # Simulate the plan from a clean start
+        sensors = {}
+        for sensor, s in self.sensors.items():
+            sensors[sensor] = [s[0], s[1], 0]
+        wakes = 0
+        t = 0
+        while sensors:
+            t = self.nextWake(sensors)
+            if t >= PLAN_HORIZON:
+                break
+            woken = self._wake(sensors, t)
+            if not woken:
+                # Should not happen with tolerances kept in range by set, but would never end
+                break
+            wakes += 1
+            charge += WAKE_CHARGE
+            for sensor in woken:
+                charge += SENSOR_CURRENT.get(sensor, 0) * onTime.get(sensor, 1.0)
+                charge += POLL_WRITES * WRITE_CHARGE + NOTIFY_CHARGE
+        current = charge / PLAN_HORIZON
+        return {"current_uA": round(current, 1),
+                "wakes_per_hour": round(wakes * 3600.0 / PLAN_HORIZON, 2),
+                "battery_days": round(BATTERY_CAPACITY / current / 86400, 1)}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# shmring.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+# Ring buffer of fixed-width samples in shared memory, for apps on the
+# same bridge that want every sample without a message for each one.
+#
+# Layout, all little-endian:
+#   header (HEADER_SIZE bytes): magic, record size, capacity, number of
+#     fields, then at WRITE_SEQ_OFFSET the number of records ever written.
+#   records: capacity records of recordSize bytes, each: seq (Q, 1 for the
+#     first record), timeStamp (d), then one double per field.
+# A record's seq is zeroed, its body written, then its seq set, and the
+# header's count is updated last. So a reader that finds the seq it expects
+# both before and after unpacking a record has a whole record.
+#
+SHM_DIR = "/dev/shm"
+MAGIC = b"CBRING01"
+HEADER_SIZE = 64
+HEADER = "<8sIII"
+WRITE_SEQ_OFFSET = 24
+
+import os
+import mmap
+import struct
+import threading
+
+def recordFormat(nFields):
+    return "<Qd" + "d" * nFields
+
+class ShmRing():
+    """ The writing end. Writes are serialised, as some characteristics
+        (eg: connected) are sent from more than one thread.
+    """
+    def __init__(self, name, fields, capacity):
+        self.path = os.path.join(SHM_DIR, name)
+        self.fields = fields
+        self.capacity = capacity
+        self.format = recordFormat(len(fields))
+        self.bodyFormat = "<d" + "d" * len(fields)
+        self.recordSize = struct.calcsize(self.format)
+        size = HEADER_SIZE + capacity * self.recordSize
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.buf = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        struct.pack_into(HEADER, self.buf, 0, MAGIC, self.recordSize, capacity, len(fields))
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def write(self, timeStamp, values):
+        with self.lock:
+            self.seq += 1
+            offset = HEADER_SIZE + ((self.seq - 1) % self.capacity) * self.recordSize
+            struct.pack_into("<Q", self.buf, offset, 0)
+            struct.pack_into(self.bodyFormat, self.buf, offset + 8, timeStamp, *values)
+            struct.pack_into("<Q", self.buf, offset, self.seq)
+            struct.pack_into("<Q", self.buf, WRITE_SEQ_OFFSET, self.seq)
+
+    def announcement(self):
+        # What a reader needs to know, for sending in a message
+        return {"path": self.path,
+                "fields": self.fields,
+                "record_format": self.format,
+                "record_size": self.recordSize,
+                "capacity": self.capacity,
+                "header_size": HEADER_SIZE,
+                "write_seq_offset": WRITE_SEQ_OFFSET}
+
+    def close(self):
+        self.buf.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class ShmRingReader():
+    """ The reading end, for apps. Maps the ring read-only and unpacks
+        records straight from the shared memory.
+    """
+    def __init__(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.buf = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, self.recordSize, self.capacity, nFields = struct.unpack_from(HEADER, self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a SensorTag ring: " + path)
+        self.format = recordFormat(nFields)
+        self.next = self.written() + 1
+
+    def written(self):
+        return struct.unpack_from("<Q", self.buf, WRITE_SEQ_OFFSET)[0]
+
+    def read(self):
+        """ Returns (lost, records): records written since the last read,
+            each (timeStamp, field, ...), and how many were overwritten
+            before they could be read.
+        """
+        last = self.written()
+        lost = 0
+        if last - self.next + 1 > self.capacity:
+            lost = last - self.next + 1 - self.capacity
+            self.next = last - self.capacity + 1
+        records = []
+        while self.next <= last:
+            offset = HEADER_SIZE + ((self.next - 1) % self.capacity) * self.recordSize
+            r = struct.unpack_from(self.format, self.buf, offset)
+            if r[0] != self.next or struct.unpack_from("<Q", self.buf, offset)[0] != self.next:
+                # Overwritten while we were reading
+                lost += 1
+            else:
+                records.append(r[1:])
+            self.next += 1
+        return lost, records
+
+    def close(self):
+        self.buf.close()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# spool.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+import os
+import struct
+import threading
+from array import array
+
+# Fields of characteristics whose data is a dict. Others have a single value.
+FIELDS = {"acceleration": ["x", "y", "z"],
+          "gyro": ["x", "y", "z"],
+          "magnetometer": ["x", "y", "z"],
+          "buttons": ["leftButton", "rightButton"]}
+
+def columns(characteristic):
+    return ["timeStamp"] + FIELDS.get(characteristic, ["value"])
+
+class Spool():
+    """ Append-only store of samples on disk, for when they cannot be delivered.
+        Samples are kept in segments of up to segmentSamples samples, one
+        directory per app and characteristic. Each segment is stored by column:
+        one file of little-endian doubles for the time stamps and one per field,
+        named <seq>.<column>. seq increases across all segments, so when the
+        spool is over maxBytes the segment with the lowest seq is removed.
+        Each sample is flushed as it is appended, so that it is on disk if the
+        adaptor is killed, and segments are synced when they are closed.
+        append is called from the getValues thread and take from the reactor.
+    """
+    def __init__(self, directory, maxBytes, segmentSamples):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.segmentSamples = segmentSamples
+        self.lock = threading.Lock()
+        self.open = {}      # (app, characteristic): [segment, samples, {column: file}]
+        self.segments = []  # [seq, app, characteristic, bytes], oldest first
+        self.bytes = 0
+        self.seq = 0
+        self.evicted = 0    # Samples lost to the size cap
+        self._scan()
+
+    def _path(self, app, characteristic, seq=None, column=None):
+        p = os.path.join(self.directory, app, characteristic)
+        if seq is not None:
+            p = os.path.join(p, "%010d.%s" % (seq, column))
+        return p
+
+    def _scan(self):
+        # Pick up segments left by a previous run
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+            return
+        for app in os.listdir(self.directory):
+            for c in os.listdir(os.path.join(self.directory, app)):
+                found = {}
+                for f in os.listdir(self._path(app, c)):
+                    seq = int(f.split(".")[0])
+                    found[seq] = found.get(seq, 0) + os.path.getsize(os.path.join(self._path(app, c), f))
+                for seq in found:
+                    if found[seq] == 0:
+                        # Opened but nothing written before the previous run ended
+                        self._remove([seq, app, c, 0], listed=False)
+                        continue
+                    self.segments.append([seq, app, c, found[seq]])
+                    self.bytes += found[seq]
+                    self.seq = max(self.seq, seq + 1)
+        self.segments.sort()
+
+    def _close(self, key):
+        segment, samples, files = self.open.pop(key)
+        for f in files.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+    def _remove(self, segment, listed=True):
+        seq, app, c, nbytes = segment
+        for column in columns(c):
+            try:
+                os.remove(self._path(app, c, seq, column))
+            except OSError:
+                pass
+        if listed:
+            self.segments.remove(segment)
+            self.bytes -= nbytes
+
+    def append(self, app, characteristic, timeStamp, data):
+        key = (app, characteristic)
+        cols = columns(characteristic)
+        if characteristic in FIELDS:
+            values = [timeStamp] + [data[f] for f in cols[1:]]
+        else:
+            values = [timeStamp, data]
+        with self.lock:
+            if key not in self.open:
+                d = self._path(app, characteristic)
+                if not os.path.isdir(d):
+                    os.makedirs(d)
+                files = {}
+                for column in cols:
+                    files[column] = open(self._path(app, characteristic, self.seq, column), "ab")
+                segment = [self.seq, app, characteristic, 0]
+                self.segments.append(segment)
+                self.open[key] = [segment, 0, files]
+                self.seq += 1
+            segment, samples, files = self.open[key]
+            for column, v in zip(cols, values):
+                files[column].write(struct.pack("<d", float(v)))
+                files[column].flush()
+            self.open[key][1] += 1
+            segment[3] += 8 * len(cols)
+            self.bytes += 8 * len(cols)
+            if self.open[key][1] >= self.segmentSamples:
+                self._close(key)
+            while self.bytes > self.maxBytes and len(self.segments) > 1:
+                oldest = self.segments[0]
+                k = (oldest[1], oldest[2])
+                if k in self.open and self.open[k][0] is oldest:
+                    self._close(k)
+                self.evicted += oldest[3] // (8 * len(columns(oldest[2])))
+                self._remove(oldest)
+
+    def pending(self, app):
+        with self.lock:
+            for s in self.segments:
+                if s[1] == app:
+                    return True
+        return False
+
+    def take(self, app):
+        """ Returns the oldest segment for app as (seq, characteristic,
+            timeStamps, data), with data in the form it was given to append
+            but with all numbers as floats. Returns None if there is nothing.
+            The segment stays in the spool, as the oldest, until remove(seq)
+            is called, so that it is not lost if it cannot be delivered.
+        """
+        with self.lock:
+            segment = None
+            for s in self.segments:
+                if s[1] == app:
+                    segment = s
+                    break
+            if segment is None:
+                return None
+            seq, app, c, nbytes = segment
+            if (app, c) in self.open and self.open[(app, c)][0] is segment:
+                self._close((app, c))
+            cols = {}
+            for column in columns(c):
+                a = array("d")
+                p = self._path(app, c, seq, column)
+                with open(p, "rb") as f:
+                    a.fromfile(f, os.path.getsize(p) // 8)
+                if struct.pack("=d", 1.0) != struct.pack("<d", 1.0):
+                    a.byteswap()
+                cols[column] = a.tolist()
+        n = min([len(v) for v in cols.values()])
+        if c in FIELDS:
+            data = [dict([(f, cols[f][i]) for f in FIELDS[c]]) for i in range(n)]
+        else:
+            data = cols["value"][:n]
+        return seq, c, cols["timeStamp"][:n], data
+
+    def remove(self, seq):
+        with self.lock:
+            for s in self.segments:
+                if s[0] == seq:
+                    self._remove(s)
+                    return
+
+    def close(self):
+        with self.lock:
+            for key in list(self.open):
+                self._close(key)
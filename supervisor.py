@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# supervisor.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+REGISTRY_FILE = "/tmp/cb_sensortag_adapters.json"  # Shared by every SensorTag adaptor on the bridge
+QUALITY_DECAY = 0.8        # Weight given to past link quality when a new result is reported
+QUALITY_WEIGHT = 4         # How many tags a fully failing adapter counts as when choosing
+DEGRADED_SCORE = 0.5       # Adapters with a failure score above this are moved away from
+
+import os
+import json
+import fcntl
+
+class AdapterPool():
+    """ Shares the bridge's HCI adapters between SensorTag adaptors.
+        Each adaptor is a separate process (and so free to run on any core)
+        with its own gatttool process. They coordinate through a registry
+        file, locked with flock, holding which tags are on which adapter
+        and a failure score (0 good, 1 always failing) for each adapter.
+    """
+    def __init__(self, adapters, registry=REGISTRY_FILE):
+        self.adapters = adapters
+        self.registry = registry
+
+    def _alive(self, pid):
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def _update(self, f):
+        """ Calls f with the registry, under the lock, and writes back the result.
+        """
+        fd = os.open(self.registry, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = b""
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                data += chunk
+            try:
+                reg = json.loads(data.decode("utf-8"))
+            except ValueError:
+                reg = {}
+            for a in self.adapters:
+                if a not in reg:
+                    reg[a] = {"tags": {}, "failures": 0.0}
+            # Forget tags whose adaptor has gone away
+            for a in reg:
+                for addr, pid in list(reg[a]["tags"].items()):
+                    if not self._alive(pid):
+                        del reg[a]["tags"][addr]
+            result = f(reg)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps(reg).encode("utf-8"))
+            return result
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _score(self, reg, adapter):
+        return len(reg[adapter]["tags"]) + QUALITY_WEIGHT * reg[adapter]["failures"]
+
+    def assign(self, addr, exclude=[]):
+        """ Puts addr on the adapter with the lowest load, allowing for link
+            quality, and returns it. Adapters in exclude are only used if
+            there is nothing else.
+        """
+        def f(reg):
+            for a in reg:
+                reg[a]["tags"].pop(addr, None)
+            candidates = [a for a in self.adapters if a not in exclude] or self.adapters
+            best = min(candidates, key=lambda a: self._score(reg, a))
+            reg[best]["tags"][addr] = os.getpid()
+            return best
+        return self._update(f)
+
+    def release(self, addr):
+        def f(reg):
+            for a in reg:
+                reg[a]["tags"].pop(addr, None)
+        self._update(f)
+
+    def report(self, adapter, ok):
+        """ Records the result of a connection attempt on adapter.
+            Returns True if the adapter is now degraded. It may still be
+            after a success, so callers should only move tags after a failure.
+        """
+        def f(reg):
+            if adapter not in reg:
+                return False
+            r = reg[adapter]
+            r["failures"] = QUALITY_DECAY * r["failures"] + (1 - QUALITY_DECAY) * (0.0 if ok else 1.0)
+            return r["failures"] > DEGRADED_SCORE
+        return self._update(f)
+
+def findAdapters(default):
+    """ Adapters named in CB_SENSORTAG_ADAPTERS (eg: "hci0,hci1"), otherwise
+        all those the kernel knows about, otherwise just default.
+    """
+    adapters = os.getenv("CB_SENSORTAG_ADAPTERS")
+    if adapters:
+        return adapters.split(",")
+    try:
+        adapters = sorted([a for a in os.listdir("/sys/class/bluetooth") if a.startswith("hci")])
+    except OSError:
+        adapters = []
+    if not adapters:
+        adapters = [default]
+    return adapters
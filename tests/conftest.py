@@ -0,0 +1,41 @@
+import os
+import sys
+import pytest
+
+# The modules under test are at the top of the repository
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+ADDR = "A0:E6:F8:00:00:01"
+
+def fake(*args):
+    """ gatttool command line that runs fakegatttool.py instead.
+    """
+    return sys.executable + " " + os.path.join(ROOT, "fakegatttool.py") + " " + " ".join(args)
+
+@pytest.fixture
+def adaptor(monkeypatch):
+    """ An Adaptor for ADDR, talking to fakegatttool. Needs the bridge's
+        cbcommslib & twisted, and is skipped without them.
+    """
+    pytest.importorskip("twisted")
+    pytest.importorskip("cbcommslib")
+    import adaptor_a
+    # Set up by hand what the bridge would, without starting the reactor
+    monkeypatch.setattr(adaptor_a.CbAdaptor, "__init__", lambda self, argv: None)
+    monkeypatch.setattr(adaptor_a, "GATT_SLEEP_TIME", 0)
+    monkeypatch.setattr(adaptor_a, "INIT_TIMEOUT", 0.5)
+    a = adaptor_a.Adaptor([])
+    a.id = "test"
+    a.addr = ADDR
+    a.device = "hci0"
+    a.sim = 0
+    a.doStop = False
+    a.cbLog = lambda level, msg: None
+    a.sendManagerMessage = lambda msg: None
+    yield a
+    a.doStop = True
+    try:
+        a.gatt.kill(9)
+    except Exception:
+        pass
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# test_delivery.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+from metrics import Metrics
+from delivery import DeliveryQueue, Deadband
+
+def queue(maxLength=3):
+    return DeliveryQueue("app", maxLength, Metrics())
+
+def test_drop_oldest():
+    q = queue()
+    for i in range(5):
+        q.put("acceleration", i, "drop_oldest")
+    assert q.full()
+    assert q.take() == [2, 3, 4]
+    assert q.metrics.counters["dropped"] == {"app": 2}
+    assert not q.full()
+
+def test_latest():
+    q = queue()
+    for i in range(5):
+        q.put("temperature", i, "latest")
+    q.put("humidity", 50, "latest")
+    assert sorted(q.take()) == [4, 50]
+    assert q.metrics.counters["dropped"] == {"app": 4}
+
+def test_never_drop_first_and_in_order():
+    q = queue()
+    q.put("acceleration", "a0", "drop_oldest")
+    q.put("temperature", "t0", "latest")
+    for i in range(10):
+        q.put("buttons", i, "never_drop")
+    assert len(q) == 12
+    assert q.take() == list(range(10)) + ["a0", "t0"]
+    assert "dropped" not in q.metrics.counters
+    assert len(q) == 0
+
+def test_one_drain_scheduled_at_a_time():
+    q = queue()
+    assert q.put("acceleration", 0, "drop_oldest")
+    assert not q.put("acceleration", 1, "drop_oldest")
+    q.take()
+    assert q.put("acceleration", 2, "drop_oldest")
+
+def test_deadband_scalar():
+    d = Deadband(absolute=0.5)
+    assert d.check(20.0, 0)
+    assert not d.check(20.4, 1)
+    assert not d.check(19.6, 2)
+    # Compared with the last value sent, not the last one seen
+    assert d.check(20.6, 3)
+    assert not d.check(21.0, 4)
+
+def test_deadband_relative():
+    d = Deadband(relative=0.1)
+    assert d.check(100.0, 0)
+    assert not d.check(109.0, 1)
+    assert d.check(111.0, 2)
+    assert not d.check(121.0, 3)
+
+def test_deadband_vector_norm():
+    d = Deadband(absolute=0.1)
+    assert d.check({"x": 1.0, "y": 0.0, "z": 0.0}, 0)
+    # Same norm, different direction
+    assert not d.check({"x": 0.0, "y": 0.0, "z": -1.0}, 1)
+    assert d.check({"x": 0.0, "y": 0.8, "z": 0.8}, 2)
+
+def test_deadband_max_interval():
+    d = Deadband(absolute=1.0, maxInterval=10)
+    assert d.check(5.0, 100)
+    assert not d.check(5.0, 109.9)
+    assert d.check(5.0, 110)
+    assert not d.check(5.0, 115)
+    assert d.check(5.0, 120)
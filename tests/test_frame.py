@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# test_frame.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+from collections import deque
+from frame import Frame, addSample
+
+def stream(frame, rates, start, end):
+    """ Samples of each characteristic at rates {characteristic: Hz}, from
+        start to end, kept as the adaptor keeps them. Each value is its time.
+    """
+    span = frame.span(dict([(c, 1.0/r) for c, r in rates.items()]))
+    history = dict([(c, deque()) for c in rates])
+    samples = []
+    for c, r in rates.items():
+        n = int((end - start) * r + 1e-9)
+        samples += [(start + i/float(r), c) for i in range(n + 1)]
+    for t, c in sorted(samples):
+        addSample(history[c], t, {"x": t} if c == "acceleration" else t, span)
+    return history
+
+def test_interpolates_to_slowest_sample():
+    f = Frame(0.5, ["acceleration", "temperature"], interpolate=True)
+    history = stream(f, {"acceleration": 100, "temperature": 1}, 1000.0, 1001.92)
+    timeStamp, data = f.build(history, 1002.0)
+    # The latest temperature is at 1001.0, so that is the time of the frame
+    assert timeStamp == 1001.0
+    assert abs(data["acceleration"]["value"]["x"] - 1001.0) < 1e-6
+    assert data["temperature"]["value"] == 1001.0
+    assert abs(data["acceleration"]["age"] - 1.0) < 1e-6
+
+def test_history_bounded_by_time():
+    f = Frame(0.5, ["acceleration", "temperature"], interpolate=True)
+    history = stream(f, {"acceleration": 100, "temperature": 1}, 1000.0, 1100.0)
+    # interval + 2 slowest periods of 100 Hz samples, and one before
+    assert len(history["acceleration"]) == 251
+    assert len(history["temperature"]) == 4
+
+def test_no_sample_at_time_is_none():
+    f = Frame(0.5, ["acceleration", "temperature"], interpolate=True)
+    history = {"acceleration": deque([(1001.9, {"x": 1.0}), (1001.92, {"x": 2.0})]),
+               "temperature": deque([(1001.5, 20.0)])}
+    timeStamp, data = f.build(history, 1002.0)
+    assert timeStamp == 1001.5
+    assert data["acceleration"] is None
+    assert data["temperature"] == {"value": 20.0, "age": 0.5}
+
+def test_events_neither_interpolated_nor_set_time():
+    f = Frame(1.0, ["buttons", "temperature"], interpolate=True)
+    history = {"buttons": deque([(10.0, {"leftButton": 1, "rightButton": 0}),
+                                 (10.1, {"leftButton": 0, "rightButton": 0})]),
+               "temperature": deque([(1000.0, 20.0), (1001.0, 21.0)])}
+    timeStamp, data = f.build(history, 1001.5)
+    assert timeStamp == 1001.0
+    assert data["buttons"]["value"] == {"leftButton": 0, "rightButton": 0}
+
+def test_latest_without_interpolate():
+    f = Frame(1.0, ["acceleration", "temperature"])
+    history = {"acceleration": deque([(1001.9, {"x": 1.0})]),
+               "temperature": deque()}
+    timeStamp, data = f.build(history, 1002.0)
+    assert timeStamp == 1002.0
+    assert data["acceleration"]["value"] == {"x": 1.0}
+    assert data["temperature"] is None
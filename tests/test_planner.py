@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# test_planner.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+from planner import DutyPlanner, BASE_CURRENT
+
+def test_new_sensors_read_straight_away():
+    p = DutyPlanner()
+    p.set("temperature", 10, 2, 0)
+    p.set("humidity", 13, 5, 0)
+    assert sorted(p.due(0)) == ["humidity", "temperature"]
+    assert p.due(0) == []
+
+def test_wakes_shared():
+    p = DutyPlanner()
+    p.set("temperature", 10, 2, 0)
+    p.set("humidity", 13, 5, 0)
+    p.due(0)
+    # temperature, next due at 8, can wait until 10. humidity, due at 8 too, but
+    # with a longer interval, may be read from 3
+    assert p.nextWake() == 10
+    assert p.due(9.9) == []
+    assert sorted(p.due(10)) == ["humidity", "temperature"]
+    # Next due at 18 and 21, and so can be read together from 16 to 20
+    assert p.nextWake() == 20
+    assert sorted(p.due(20)) == ["humidity", "temperature"]
+
+def test_no_drift():
+    p = DutyPlanner()
+    p.set("temperature", 10, 2, 0)
+    p.set("humidity", 13, 5, 0)
+    p.due(0)
+    for i in range(100):
+        p.due(p.nextWake())
+    # Each read, early or late, leaves the sensor on its own schedule
+    for sensor, (interval, tolerance, due) in p.sensors.items():
+        assert (due + tolerance) % interval == 0
+
+def test_missed_reads_rescheduled():
+    p = DutyPlanner()
+    p.set("temperature", 10, 2, 0)
+    p.due(0)
+    assert p.due(100) == ["temperature"]
+    assert p.nextWake() == 112
+
+def test_tolerance_kept_in_range():
+    p = DutyPlanner()
+    p.set("temperature", 10, 8, 0)
+    p.set("humidity", 10, -1, 0)
+    assert p.sensors["temperature"][1] == 5
+    assert p.sensors["humidity"][1] == 0
+
+def test_estimate():
+    p = DutyPlanner()
+    assert p.estimate({}, {})["current_uA"] == BASE_CURRENT
+    p.set("temperature", 60, 10, 0)
+    alone = p.estimate({}, {})
+    assert alone["wakes_per_hour"] == 60
+    # A second sensor on the same interval shares every wake
+    p.set("humidity", 60, 10, 0)
+    shared = p.estimate({}, {})
+    assert shared["wakes_per_hour"] == 60
+    assert shared["current_uA"] > alone["current_uA"]
+    assert shared["battery_days"] < alone["battery_days"]
+
+def test_estimate_ends_with_bad_tolerance():
+    p = DutyPlanner()
+    # As set would have done before tolerances were kept in range
+    p.sensors["temperature"] = [10, -1, 0]
+    assert p.estimate({}, {})["wakes_per_hour"] == 0
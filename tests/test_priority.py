@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# test_priority.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+# Button press to delivery latency, with movement notified at 100 Hz and an
+# app that can't keep up. Latency is from when fakegatttool wrote the press.
+# Run with -s to see the figures.
+#
+import time
+import threading
+import pytest
+from delivery import DeliveryQueue
+from conftest import fake
+
+RATE = 100      # Movement notifications per second
+PRESSES = 0.25  # Seconds between button presses
+SLOW = 0.012    # Time the app takes for each movement sample. Longer than the time between them (sec)
+RUN = 4         # (sec)
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+def run(adaptor, tmp_path, priority):
+    log = str(tmp_path / "presses")
+    adaptor.priority = priority
+    adaptor.gatttool = fake("--rate", str(RATE), "--buttons", str(PRESSES), "--press-log", log)
+    for c in ("acceleration", "buttons"):
+        adaptor.notifyApps[c].append("app")
+    adaptor.policy["app"] = {}
+    adaptor.deadbands["app"] = {}
+    adaptor.deliveryQueues["app"] = DeliveryQueue("app", 500, adaptor.metrics)
+    delivered = []
+    def sendMessage(msg, app):
+        if msg["characteristic"] != "buttons":
+            time.sleep(SLOW)
+        elif msg["data"]["rightButton"]:
+            delivered.append(time.time())
+    adaptor.sendMessage = sendMessage
+    # Deliver in the getValues thread, so that the app holds up reading from gatttool
+    adaptor.callFromThread = lambda f, *args: f(*args)
+    assert adaptor.initSensorTag() == "ok"
+    assert adaptor.switchSensors() == "ok"
+    started = time.time()
+    t = threading.Thread(target=adaptor.getValues)
+    t.start()
+    time.sleep(RUN)
+    adaptor.doStop = True
+    adaptor.gatt.kill(9)
+    t.join(10)
+    assert not t.is_alive()
+    with open(log) as f:
+        # Presses while sensors were being switched on are lost, as they are with a real tag
+        presses = [float(l) for l in f if float(l) > started]
+    # Presses are never dropped and are delivered in order. Some may not have been delivered yet
+    assert len(delivered) <= len(presses)
+    assert len(delivered) >= RUN / PRESSES / 2
+    latency = [d - p for p, d in zip(presses, delivered)]
+    print("\npriority %s: %d of %d presses delivered, latency p50 %.3f p99 %.3f max %.3f sec, bad lines %s" %
+          (priority, len(delivered), len(presses), percentile(latency, 0.5), percentile(latency, 0.99),
+           max(latency), adaptor.metrics.counters.get("bad_lines", 0)))
+    return latency
+
+@pytest.mark.parametrize("priority", [True, False])
+def test_press_latency(adaptor, tmp_path, priority):
+    latency = run(adaptor, tmp_path, priority)
+    assert "bad_lines" not in adaptor.metrics.counters
+    if priority:
+        # Presses only wait for the sample being delivered when they arrive
+        assert percentile(latency, 0.5) < 0.1
+    else:
+        # Without the priority path they wait behind the growing backlog
+        assert percentile(latency, 0.5) > 0.1
+
+def test_bad_lines(adaptor):
+    adaptor.gatttool = fake()
+    assert adaptor.initSensorTag() == "ok"
+    sent = []
+    adaptor.sendcharacteristic = lambda c, data, timeStamp, trace=None: sent.append((c, data))
+    # A button press that has only partly been read is left for later
+    adaptor.gatt.buffer = "Notification handle = 0x0049 value: 01 \r\nNotification handle = 0x0049 val"
+    assert adaptor.takePriorityLines() == ["handle = 0x0049 value: 01 \r\n"]
+    assert adaptor.gatt.buffer.endswith("handle = 0x0049 val")
+    # A line that can't be decoded is counted and skipped
+    adaptor.gatt.buffer = "Notification handle = 0x0039 value: 01\r\nNotification handle = 0x0049 value: 02\r\n"
+    t = threading.Thread(target=adaptor.getValues)
+    t.start()
+    time.sleep(1)
+    adaptor.doStop = True
+    adaptor.gatt.kill(9)
+    t.join(10)
+    assert adaptor.metrics.counters["bad_lines"] == 1
+    assert sent == [("buttons", {"leftButton": 1, "rightButton": 0})]
+
+def test_priority_off_with_unknown_pexpect(adaptor, monkeypatch):
+    import pexpect
+    monkeypatch.setattr(pexpect, "__version__", "5.0")
+    adaptor.gatttool = fake()
+    assert adaptor.initSensorTag() == "ok"
+    assert not adaptor.priority
+    adaptor.gatt.buffer = "Notification handle = 0x0049 value: 01 \r\n"
+    assert adaptor.takePriorityLines() == []
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# test_shmring.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+import os
+import threading
+from shmring import ShmRing, ShmRingReader
+
+def test_writers_in_several_threads():
+    ring = ShmRing("cb_sensortag_test_%d" % os.getpid(), ["value"], 100000)
+    try:
+        reader = ShmRingReader(ring.path)
+        def write(k):
+            for i in range(10000):
+                ring.write(float(i), [float(k)])
+        threads = [threading.Thread(target=write, args=(k,)) for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        lost, records = reader.read()
+        assert lost == 0
+        assert len(records) == 40000
+        for k in range(4):
+            assert [r[0] for r in records if r[1] == k] == [float(i) for i in range(10000)]
+        reader.close()
+    finally:
+        ring.close()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# test_spool.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+import os
+import subprocess
+import sys
+from spool import Spool
+from delivery import DeliveryQueue
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def accel(i):
+    return {"x": i, "y": -i, "z": 0.5}
+
+def test_samples_survive_kill(tmp_path):
+    # Append to an open segment, then die without closing the spool
+    script = "import os, sys; sys.path.insert(0, %r)\n" \
+             "from spool import Spool\n" \
+             "s = Spool(%r, 10**6, 1000)\n" \
+             "for i in range(10):\n" \
+             "    s.append('app', 'acceleration', 1000.0 + i, {'x': i, 'y': -i, 'z': 0.5})\n" \
+             "os._exit(1)\n" % (ROOT, str(tmp_path))
+    subprocess.call([sys.executable, "-c", script])
+    s = Spool(str(tmp_path), 10**6, 1000)
+    seq, c, timeStamps, data = s.take("app")
+    assert c == "acceleration"
+    assert timeStamps == [1000.0 + i for i in range(10)]
+    assert data == [accel(i) for i in range(10)]
+
+def test_empty_segments_skipped(tmp_path):
+    d = tmp_path / "app" / "acceleration"
+    d.mkdir(parents=True)
+    for column in ("timeStamp", "x", "y", "z"):
+        (d / ("0000000000." + column)).write_bytes(b"")
+    s = Spool(str(tmp_path), 10**6, 1000)
+    assert not s.pending("app")
+    assert s.take("app") is None
+    assert os.listdir(str(d)) == []
+
+def test_segment_kept_until_removed(tmp_path):
+    s = Spool(str(tmp_path), 10**6, 2)
+    for i in range(4):
+        s.append("app", "temperature", float(i), 20.0 + i)
+    first = s.take("app")
+    # Not delivered: the same segment is still the oldest
+    assert s.take("app") == first
+    s.remove(first[0])
+    seq, c, timeStamps, data = s.take("app")
+    assert timeStamps == [2.0, 3.0]
+    assert data == [22.0, 23.0]
+    s.remove(seq)
+    assert s.take("app") is None
+    assert s.bytes == 0
+
+def test_close(tmp_path):
+    s = Spool(str(tmp_path), 10**6, 1000)
+    s.append("app", "humidity", 1.0, 50.0)
+    s.close()
+    s = Spool(str(tmp_path), 10**6, 1000)
+    assert s.take("app")[1:] == ("humidity", [1.0], [50.0])
+
+def sample(i, characteristic="temperature"):
+    return {"id": "test", "content": "characteristic", "characteristic": characteristic,
+            "data": 20.0 + i, "timeStamp": float(i)}
+
+def test_spooled_until_flushed(adaptor, tmp_path, monkeypatch):
+    import adaptor_a
+    later = []
+    monkeypatch.setattr(adaptor_a.reactor, "callLater", lambda delay, f, *args: later.append((f, args)))
+    adaptor.callFromThread = lambda f, *args: f(*args)
+    adaptor.spool = Spool(str(tmp_path), 10**6, 1000)
+    adaptor.policy["app"] = {}
+    adaptor.deliveryQueues["app"] = DeliveryQueue("app", 10, adaptor.metrics)
+    adaptor.spooled["app"] = ["temperature"]
+    sent = []
+    up = [False]
+    def sendMessage(msg, app):
+        if not up[0]:
+            raise IOError("link down")
+        sent.append(msg)
+    adaptor.sendMessage = sendMessage
+    # Only a failed send starts spooling. Characteristics not asked for are dropped
+    adaptor.queueForApp("humidity", sample(0, "humidity"), "app", None)
+    assert not adaptor.spooling.get("app")
+    adaptor.queueForApp("temperature", sample(1), "app", None)
+    assert adaptor.spooling["app"]
+    # Later samples go behind it, even once the app can be reached
+    up[0] = True
+    adaptor.queueForApp("temperature", sample(2), "app", None)
+    assert sent == []
+    while later:
+        f, args = later.pop(0)
+        f(*args)
+        if f == adaptor.flushSpool and len(sent) == 1:
+            # Arrives while the spool is being flushed
+            adaptor.queueForApp("temperature", sample(3), "app", None)
+    assert [m["content"] for m in sent] == ["characteristic_batch"] * 2
+    assert sent[0]["timeStamp"] == [1.0, 2.0]
+    assert sent[1]["timeStamp"] == [3.0]
+    assert not adaptor.spooling["app"]
+    assert adaptor.metrics.counters["dropped"]["app"] == 1
+    # Then straight to the app again
+    adaptor.queueForApp("temperature", sample(4), "app", None)
+    assert sent[-1] == sample(4)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# test_supervisor.py
+# Copyright (C) ContinuumBridge Limited, 2026 - All Rights Reserved
+#
+# Supervisor mode, driven against fakegatttool.py rather than a real tag.
+#
+import os
+import sys
+import json
+import time
+import subprocess
+import pytest
+from supervisor import AdapterPool, DEGRADED_SCORE
+from conftest import ADDR, fake
+
+ADAPTERS = ["hci0", "hci1"]
+
+@pytest.fixture
+def pool(tmp_path):
+    return AdapterPool(ADAPTERS, str(tmp_path / "adapters.json"))
+
+def registry(pool):
+    with open(pool.registry) as f:
+        return json.load(f)
+
+def test_assign_balances_load(pool):
+    assert pool.assign("A") == "hci0"
+    assert pool.assign("B") == "hci1"
+    # Assigning again moves rather than adds a tag
+    assert pool.assign("A") == "hci0"
+    reg = registry(pool)
+    assert reg["hci0"]["tags"] == {"A": os.getpid()}
+    assert reg["hci1"]["tags"] == {"B": os.getpid()}
+
+def test_degraded_adapter_avoided(pool):
+    pool.assign("A")
+    pool.assign("B")
+    degraded = [pool.report("hci0", False) for i in range(4)]
+    assert degraded == [False, False, False, True]
+    assert registry(pool)["hci0"]["failures"] > DEGRADED_SCORE
+    # hci1 already has a tag, but is still preferred to a failing adapter
+    assert pool.assign("C") == "hci1"
+
+def test_exclude(pool):
+    assert pool.assign("A", exclude=["hci0"]) == "hci1"
+    assert pool.assign("A", exclude=ADAPTERS) == "hci0"
+
+def test_dead_adaptor_forgotten(pool):
+    p = subprocess.Popen([sys.executable, "-c", ""])
+    p.wait()
+    with open(pool.registry, "w") as f:
+        json.dump({"hci0": {"tags": {"X": p.pid}, "failures": 0.0}}, f)
+    pool.release("A")
+    reg = registry(pool)
+    assert reg["hci0"]["tags"] == {}
+    assert reg["hci1"]["tags"] == {}
+
+@pytest.fixture
+def adaptor(adaptor, pool):
+    adaptor.pool = pool
+    adaptor.device = pool.assign(ADDR)
+    return adaptor
+
+def test_gatttool_restarted_up_to_limit(adaptor):
+    import adaptor_a
+    adaptor.gatttool = fake("--crash-after", "0.5")
+    assert adaptor.initSensorTag() == "ok"
+    # Returns once gatttool has died more times than it may be restarted
+    adaptor.getValues()
+    assert adaptor.restarts == adaptor_a.MAX_RESTARTS
+    assert adaptor.metrics.counters["restarts"] == adaptor_a.MAX_RESTARTS
+    assert adaptor.status == "error"
+
+def test_restarts_allowed_again_after_window(adaptor):
+    import adaptor_a
+    adaptor.gatttool = fake()
+    assert adaptor.initSensorTag() == "ok"
+    adaptor.restarts = adaptor_a.MAX_RESTARTS
+    adaptor.lastRestart = time.time()
+    assert not adaptor.restartGatt()
+    adaptor.lastRestart = time.time() - adaptor_a.RESTART_WINDOW - 1
+    assert adaptor.restartGatt()
+    assert adaptor.restarts == 1
+    assert adaptor.connected
+
+def test_failing_adapter_left(adaptor, pool):
+    adaptor.gatttool = fake("--fail-connect", "1")
+    assert adaptor.device == "hci0"
+    for i in range(10):
+        assert adaptor.initSensorTag() == "timeout"
+        if adaptor.device != "hci0":
+            break
+    assert adaptor.device == "hci1"
+    assert adaptor.metrics.counters["adapter_moves"] == 1
+    reg = registry(pool)
+    assert ADDR in reg["hci1"]["tags"]
+    assert ADDR not in reg["hci0"]["tags"]
+
+def test_success_on_degraded_adapter_stays(adaptor, pool):
+    for i in range(5):
+        pool.report("hci0", False)
+    adaptor.gatttool = fake()
+    assert adaptor.initSensorTag() == "ok"
+    # Still degraded, but gatttool is connected through it
+    assert registry(pool)["hci0"]["failures"] > DEGRADED_SCORE
+    assert adaptor.device == "hci0"
+    assert ADDR in registry(pool)["hci0"]["tags"]
+
+def test_restart_gives_up_if_tag_unreachable(adaptor):
+    import adaptor_a
+    adaptor.gatttool = fake()
+    assert adaptor.initSensorTag() == "ok"
+    adaptor.gatttool = fake("--fail-connect", "1")
+    attempts = []
+    init = adaptor.initSensorTag
+    adaptor.initSensorTag = lambda: attempts.append(1) or init()
+    assert not adaptor.restartGatt()
+    assert len(attempts) == adaptor_a.RESTART_ATTEMPTS
+    assert adaptor.restarts == 1
+    assert not adaptor.connected